@@ -0,0 +1,113 @@
+"""
+Measures download_images and download_videos against local stand-in server (see benchmarks/server.py), no network access needed.
+Run from repository root: python -m benchmarks.download [--images N] [--image-size BYTES] [--videos N] [--video-size BYTES] [--ffmpeg PATH] [case ...]
+Every case runs in its own process, so its peak RSS isn't affected by other cases.
+Video cases need ffmpeg (skipped if it isn't found), exit code is 1 if any case failed or any video of video cases wasn't saved.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.server import IMAGE_SIZE, IMAGES, StandInServer, VIDEO_SIZE, VIDEOS
+
+
+# name: (function, page, folder, options), cases with the same folder run on the same save folder (one after another)
+CASES = {
+	"images": ("images", "images", "images", {}),
+	"images again": ("images", "images", "images", {}),  # everything is already downloaded (conditional requests)
+	"duplicates": ("images", "duplicates", "duplicates", {}),
+	"slow": ("images", "slow", "slow", {}),
+	"throttled": ("images", "throttled", "throttled", {}),
+	"videos streamed": ("videos", "videos", "videos streamed", {"stream": True}),
+	"videos downloaded": ("videos", "videos", "videos downloaded", {"stream": False}),
+}
+
+
+def peak_rss() -> int:
+	"""
+	Returns peak resident set size of this process in bytes.
+	"""
+
+	if sys.platform == "win32":
+		import psutil
+		return psutil.Process().memory_info().peak_wset
+	import resource
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak if sys.platform == "darwin" else peak * 1024  # kilobytes on Linux
+
+def run_case(function, url, folder, ffmpeg, options) -> dict:
+	"""
+	Runs single case (in child process).
+	:return: Wall time, peak RSS and counts of download results.
+	"""
+
+	start = time.perf_counter()
+	if function == "images":
+		from scripts.image import download_images
+		results = download_images(url, folder, **options)
+	else:
+		from scripts.video import download_videos
+		results = download_videos(url, folder, ffmpeg, **options)
+	seconds = time.perf_counter() - start
+	return {"seconds": seconds, "peak_rss": peak_rss(), "results": None if results is None else dict(Counter(map(str, results.values())))}
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark downloads against local stand-in server.")
+	parser.add_argument("cases", nargs="*", help=f"cases to run (default: all): {', '.join(CASES)}")
+	parser.add_argument("--images", type=int, default=IMAGES)
+	parser.add_argument("--image-size", type=int, default=IMAGE_SIZE)
+	parser.add_argument("--videos", type=int, default=VIDEOS)
+	parser.add_argument("--video-size", type=int, default=VIDEO_SIZE)
+	parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"))
+	parser.add_argument("--child", nargs=5, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child is not None:
+		function, url, folder, ffmpeg, options = args.child
+		print(json.dumps(run_case(function, url, folder, ffmpeg, json.loads(options))))
+		return
+	for name in args.cases:
+		if name not in CASES:
+			parser.error(f"unknown case: {name}")
+
+	failed = False
+	server = StandInServer(images=args.images, image_size=args.image_size, videos=args.videos, video_size=args.video_size).start()
+	print(f"{'case':<20} {'wall time':>10} {'MiB/s':>8} {'peak RSS':>10} {'requests':>9}  results / requests by status")
+	with tempfile.TemporaryDirectory() as temp_folder:
+		for name in args.cases or CASES:
+			function, page, folder, options = CASES[name]
+			if function == "videos" and args.ffmpeg is None:
+				print(f"{name:<20} skipped (ffmpeg not found)")
+				continue
+
+			server.stats()
+			command = [sys.executable, "-m", "benchmarks.download", "--child", function, f"{server.url}/{page}.html",
+			           os.path.join(temp_folder, folder), args.ffmpeg or "", json.dumps(options)]
+			completed = subprocess.run(command, capture_output=True, text=True)
+			stats = server.stats()
+			if completed.returncode != 0:
+				print(f"{name:<20} failed: {completed.stderr.strip().splitlines()[-1:]}")
+				failed = True
+				continue
+
+			result = json.loads(completed.stdout.splitlines()[-1])
+			throughput = stats["bytes"] / result["seconds"] / 1024 / 1024
+			print(f"{name:<20} {result['seconds']:8.2f} s {throughput:8.1f} {result['peak_rss'] / 1024 / 1024:6.0f} MiB "
+			      f"{sum(stats['requests'].values()):9}  {result['results']} / {stats['statuses']}")
+			if function == "videos" and result["results"] != {"True": args.videos}:
+				print(f"{name:<20} failed: not every video was saved")
+				failed = True
+	server.shutdown()
+	if failed:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,61 @@
+"""
+Measures format selection on large format tables.
+Run from repository root: python -m benchmarks.formats
+"""
+
+import random
+import time
+
+from scripts.formats import FormatPolicy, select_formats
+
+
+TABLE_SIZES = [100, 1_000, 10_000, 100_000]
+REPEATS = 5
+POLICIES = {
+	"default": FormatPolicy(),
+	"1080p avc1/mp4": FormatPolicy(max_height=1080, video_codecs=("avc1",), audio_codecs=("mp4a",), containers=("mp4", "m4a")),
+	"bitrate per pixel": FormatPolicy(bitrate_per_pixel=True),
+	"100 MB budget": FormatPolicy(size_budget=100 * 1024 * 1024),
+}
+
+
+def synthetic_formats(count, seed=0) -> list[dict]:
+	"""
+	Generates format table resembling yt-dlp's (sorted worst to best, mix of video only, audio only and storyboard formats).
+	"""
+
+	rng = random.Random(seed)
+	resolutions = [(256, 144), (426, 240), (640, 360), (854, 480), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+	formats = []
+	for i in range(count):
+		match i % 10:
+			case 0:
+				formats.append({"format_id": f"sb{i}", "vcodec": "none", "acodec": "none", "ext": "mhtml"})
+			case 1 | 2:
+				formats.append({"format_id": f"a{i}", "vcodec": "none", "acodec": rng.choice(["mp4a.40.2", "opus"]), "ext": rng.choice(["m4a", "webm"]),
+				                "abr": rng.randint(48, 256), "filesize": rng.choice([None, rng.randint(10**6, 10**8)])})
+			case _:
+				width, height = rng.choice(resolutions)
+				size_key = rng.choice(["filesize", "filesize_approx"])
+				formats.append({"format_id": f"v{i}", "vcodec": rng.choice(["avc1.64001F", "vp9", "av01.0.08M.08"]), "acodec": "none",
+				                "ext": rng.choice(["mp4", "webm"]), "width": width, "height": height, "fps": rng.choice([30, 60]),
+				                "tbr": rng.uniform(100, 20_000), size_key: rng.choice([None, rng.randint(10**6, 10**10)])})
+	formats.sort(key=lambda fmt: (fmt.get("height") or 0, fmt.get("tbr") or fmt.get("abr") or 0))
+	return formats
+
+def main():
+	for count in TABLE_SIZES:
+		formats = synthetic_formats(count)
+		print(f"{count} formats")
+		for name, policy in POLICIES.items():
+			best = float("inf")
+			selected = None
+			for _ in range(REPEATS):
+				start = time.perf_counter()
+				selected = select_formats(formats, policy)
+				best = min(best, time.perf_counter() - start)
+			print(f"  {name:<20} {best * 1000:9.3f} ms  {selected}")
+
+
+if __name__ == "__main__":
+	main()
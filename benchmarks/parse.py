@@ -0,0 +1,52 @@
+"""
+Compares HTML parser backends used for finding images.
+Run from repository root: python -m benchmarks.parse [saved_page.html ...]
+Without arguments, synthetic listing page is generated.
+"""
+
+import sys
+import time
+
+from scripts.extract import extract_images, HTML_PARSERS, LXML_AVAILABLE
+
+
+REPEATS = 3
+
+
+def synthetic_page(items=10_000) -> str:
+	rows = []
+	for i in range(items):
+		rows.append(f'<div class="item" id="item-{i}"><p>Item {i} <span>description &amp; details</span></p>'
+		            f'<a href="/gallery/{i}.html">page</a><a href="/full/{i}.jpg"><img src="/thumbs/{i}.png" alt="thumb {i}"></a></div>')
+	return f"<html><head><title>Listing</title></head><body>{''.join(rows)}</body></html>"
+
+def benchmark(page, parser) -> tuple[float, int]:
+	best = float("inf")
+	images = []
+	for _ in range(REPEATS):
+		start = time.perf_counter()
+		images = extract_images(page, "https://example.com/", parser)
+		best = min(best, time.perf_counter() - start)
+	return best, len(images)
+
+def main():
+	if len(sys.argv) > 1:
+		pages = []
+		for path in sys.argv[1:]:
+			with open(path, encoding="utf-8", errors="replace") as opened_file:
+				pages.append((path, opened_file.read()))
+	else:
+		pages = [("synthetic", synthetic_page())]
+
+	for name, page in pages:
+		print(f"{name} ({len(page) / 1024 / 1024:.1f} MiB)")
+		for parser in HTML_PARSERS:
+			if parser == "lxml" and not LXML_AVAILABLE:
+				print(f"  {parser:<12} not installed")
+				continue
+			seconds, found = benchmark(page, parser)
+			print(f"  {parser:<12} {seconds * 1000:8.1f} ms  {found} images")
+
+
+if __name__ == "__main__":
+	main()
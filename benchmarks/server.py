@@ -0,0 +1,224 @@
+"""
+Local HTTP server standing in for real websites in benchmarks (no network access needed).
+Run from repository root to browse it: python -m benchmarks.server [port]
+
+Pages:
+/images.html       IMAGES images of IMAGE_SIZE bytes, every one with different content (with ETag, so they can be revalidated)
+/duplicates.html   images which all have the same file name, half of them with the same content
+/slow.html         images served after SLOW_DELAY seconds
+/throttled.html    images answered with 429 (and Retry-After) when more than THROTTLE_LIMIT are requested at the same time
+/videos.html       VIDEOS <video> elements, handled by yt-dlp's generic extractor as playlist
+                   (every video is DASH manifest with separate video and audio file of VIDEO_SIZE bytes, both served as plain HTTP files)
+
+Video and audio are valid one second files from fixtures folder (so ffmpeg can mux them), padded to VIDEO_SIZE with a free box. They were made with:
+ffmpeg -f lavfi -i color=c=blue:s=64x36:r=10:d=1 -c:v libx264 -preset ultrafast -pix_fmt yuv420p -movflags +faststart -an video.mp4
+ffmpeg -f lavfi -i sine=frequency=440:duration=1:sample_rate=8000 -c:a aac -b:a 8k -ac 1 -movflags +faststart audio.m4a
+"""
+
+import http.server
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+IMAGES = 200
+IMAGE_SIZE = 64 * 1024
+VIDEOS = 4
+VIDEO_SIZE = 8 * 1024 * 1024
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT1S" minBufferTime="PT1S" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">
+<Period>
+<AdaptationSet mimeType="video/mp4" contentType="video">
+<Representation id="video" codecs="avc1.42c00a" width="64" height="36" bandwidth="1000000"><BaseURL>video.mp4</BaseURL></Representation>
+</AdaptationSet>
+<AdaptationSet mimeType="audio/mp4" contentType="audio" lang="en">
+<Representation id="audio" codecs="mp4a.40.2" audioSamplingRate="8000" bandwidth="128000"><BaseURL>audio.m4a</BaseURL></Representation>
+</AdaptationSet>
+</Period>
+</MPD>
+"""
+SLOW_DELAY = 0.2  # seconds
+THROTTLE_LIMIT = 4  # concurrent requests
+RETRY_AFTER = 1  # seconds
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+	"""
+	Server with synthetic pages, images and videos, which counts requests and bytes it served.
+	"""
+
+	daemon_threads = True
+
+	def __init__(self, port=0, images=IMAGES, image_size=IMAGE_SIZE, videos=VIDEOS, video_size=VIDEO_SIZE,
+	             slow_delay=SLOW_DELAY, throttle_limit=THROTTLE_LIMIT):
+		"""
+		:param port: Port to listen on (on localhost), 0 for any free port.
+		:param images: Number of images on every image page.
+		:param image_size: Size of every image in bytes.
+		:param videos: Number of videos on video page.
+		:param video_size: Size of every video and audio file in bytes (at least size of the fixture).
+		:param slow_delay: Delay of every slow image in seconds.
+		:param throttle_limit: Number of throttled images which can be requested at the same time.
+		"""
+
+		super().__init__(("127.0.0.1", port), _Handler)
+		self.images = images
+		self.videos = videos
+		self.slow_delay = slow_delay
+		self.throttle_limit = throttle_limit
+
+		# content is generated once, files differ only in their first bytes (so they have different hashes)
+		rng = random.Random(0)
+		self.image_data = rng.randbytes(image_size)
+		# media files differ in the first bytes of their padding
+		self.video_data, self.video_padding = _padded(os.path.join(FIXTURES, "video.mp4"), video_size, rng)
+		self.audio_data, self.audio_padding = _padded(os.path.join(FIXTURES, "audio.m4a"), video_size, rng)
+
+		self.lock = threading.Lock()
+		self.requests = Counter()
+		self.statuses = Counter()
+		self.bytes_sent = 0
+		self.throttled_in_flight = 0
+
+	@property
+	def url(self) -> str:
+		return f"http://127.0.0.1:{self.server_address[1]}"
+
+	def start(self) -> "StandInServer":
+		"""
+		Starts serving in background thread.
+		:return: Self.
+		"""
+
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+		return self
+
+	def stats(self) -> dict:
+		"""
+		Returns and resets counters.
+		:return: Number of requests per page/file type, per status code and number of bytes sent.
+		"""
+
+		with self.lock:
+			stats = {"requests": dict(self.requests), "statuses": dict(self.statuses), "bytes": self.bytes_sent}
+			self.requests.clear()
+			self.statuses.clear()
+			self.bytes_sent = 0
+		return stats
+
+	def page(self, name) -> str | None:
+		match name:
+			case "images":
+				tags = [f'<img src="/images/{i}.png">' for i in range(self.images)]
+			case "duplicates":
+				tags = [f'<img src="/duplicates/{i}/image.png">' for i in range(self.images)]
+			case "slow":
+				tags = [f'<img src="/slow/{i}.png">' for i in range(self.images)]
+			case "throttled":
+				tags = [f'<img src="/throttled/{i}.png">' for i in range(self.images)]
+			case "videos":
+				tags = [f'<video src="/media/{i}/manifest.mpd"></video>' for i in range(self.videos)]
+			case _:
+				return None
+		return f"<html><head><title>{name}</title></head><body>{''.join(tags)}</body></html>"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"  # keep-alive, like real servers
+	server: StandInServer
+
+	def log_message(self, format, *args):
+		pass
+
+	def do_GET(self):
+		parts = self.path.split("?")[0].strip("/").split("/")
+		kind = parts[0].removesuffix(".html")
+		with self.server.lock:
+			self.server.requests[kind] += 1
+
+		if len(parts) == 1:
+			page = self.server.page(kind)
+			if page is None:
+				self._send(404, b"")
+			else:
+				self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+			return
+
+		try:
+			number = int(parts[1].split(".")[0])
+		except ValueError:
+			self._send(404, b"")
+			return
+
+		match kind:
+			case "images":
+				etag = f'"{number}"'
+				if self.headers.get("If-None-Match") == etag:
+					self._send(304, b"", headers={"ETag": etag})
+				else:
+					self._send(200, _numbered(self.server.image_data, number), "image/png", headers={"ETag": etag})
+			case "slow":
+				time.sleep(self.server.slow_delay)
+				self._send(200, _numbered(self.server.image_data, number), "image/png")
+			case "duplicates":
+				self._send(200, _numbered(self.server.image_data, number // 2), "image/png")
+			case "throttled":
+				with self.server.lock:
+					throttled = self.server.throttled_in_flight >= self.server.throttle_limit
+					if not throttled:
+						self.server.throttled_in_flight += 1
+				if throttled:
+					self._send(429, b"", headers={"Retry-After": str(RETRY_AFTER)})
+					return
+				try:
+					time.sleep(self.server.slow_delay / 4)
+					self._send(200, _numbered(self.server.image_data, number), "image/png")
+				finally:
+					with self.server.lock:
+						self.server.throttled_in_flight -= 1
+			case "media" if len(parts) == 3:
+				match parts[2]:
+					case "manifest.mpd":
+						self._send(200, MANIFEST.encode("utf-8"), "application/dash+xml")
+					case "video.mp4":
+						self._send(200, _numbered(self.server.video_data, number, self.server.video_padding), "video/mp4")
+					case "audio.m4a":
+						self._send(200, _numbered(self.server.audio_data, number, self.server.audio_padding), "audio/mp4")
+					case _:
+						self._send(404, b"")
+			case _:
+				self._send(404, b"")
+
+	def _send(self, status, body, content_type="application/octet-stream", headers=None):
+		self.send_response(status)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", str(len(body)))
+		for key, value in (headers or {}).items():
+			self.send_header(key, value)
+		self.end_headers()
+		self.wfile.write(body)
+		with self.server.lock:
+			self.server.statuses[status] += 1
+			self.server.bytes_sent += len(body)
+
+
+def _numbered(data, number, offset=0) -> bytes:
+	prefix = number.to_bytes(8, "little", signed=True)
+	return data[:offset] + prefix + data[offset + len(prefix):]
+
+def _padded(path, size, rng) -> tuple[bytes, int]:
+	# appends free box (ignored by players and ffmpeg) to MP4 file, returns the content and offset of the padding
+	with open(path, "rb") as media_file:
+		data = media_file.read()
+	padding = max(size - len(data) - 8, 8)
+	return data + (padding + 8).to_bytes(4, "big") + b"free" + rng.randbytes(padding), len(data) + 8
+
+
+if __name__ == "__main__":
+	server = StandInServer(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+	print(f"Serving on {server.url}")
+	server.serve_forever()
@@ -0,0 +1,73 @@
+"""
+Measures startup time of the GUI: time until the window is shown and time until the first HTTP request is done.
+Run from repository root: python -m benchmarks.startup [--exe BUILT_EXECUTABLE ...]
+Without --exe, the program is started from source (main.py, with the probe from benchmarks/startup_probe.py installed).
+Executables built with the probe (python build.py --startup-probe, python build.py --onedir --startup-probe)
+can be passed to compare build profiles. Needs a display.
+"""
+
+import argparse
+import http.server
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.startup_probe import PROBE_VARIABLE
+
+
+REPEATS = 5
+EXIT_CODES = [0, -9, 15]  # program kills itself once the window is closed (-9 on POSIX, 15 on Windows)
+
+
+def measure(command, probe) -> float | None:
+	"""
+	Starts the program and waits until it exits (it exits on its own right after the startup probe).
+	:param command: Command line starting the program.
+	:param probe: "" to exit once window is shown, url to exit once it was downloaded.
+	:return: Wall time in seconds, None if the program failed.
+	"""
+
+	env = dict(os.environ, **{PROBE_VARIABLE: probe})
+	start = time.perf_counter()
+	completed = subprocess.run(command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	elapsed = time.perf_counter() - start
+	return elapsed if completed.returncode in EXIT_CODES else None
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure startup time of Media Scraper.")
+	parser.add_argument("--exe", action="append", default=[], help="built executable to measure (can be repeated)")
+	parser.add_argument("--repeats", type=int, default=REPEATS)
+	parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		# the program from source, probe was installed when benchmarks.startup_probe was imported
+		runpy.run_path("main.py", run_name="__main__")
+		return
+
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), http.server.SimpleHTTPRequestHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	probe_url = f"http://127.0.0.1:{server.server_address[1]}/README.md"
+
+	targets = {"source": [sys.executable, "-m", "benchmarks.startup", "--child"]}
+	for exe in args.exe:
+		targets[exe] = [os.path.abspath(exe)]
+
+	print(f"{'profile':<40} {'time to window':>16} {'time to first request':>24}")
+	for name, command in targets.items():
+		window = [measure(command, "") for _ in range(args.repeats)]
+		request = [measure(command, probe_url) for _ in range(args.repeats)]
+		if None in window or None in request:
+			print(f"{name:<40} {'failed (no display?)':>42}")
+			continue
+		print(f"{name:<40} {statistics.median(window) * 1000:13.0f} ms {statistics.median(request) * 1000:21.0f} ms")
+
+	server.shutdown()
+
+
+if __name__ == "__main__":
+	main()
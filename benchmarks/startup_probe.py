@@ -0,0 +1,39 @@
+"""
+Startup probe used by benchmarks/startup.py: once the main window is shown, downloads url from MEDIA_SCRAPER_STARTUP_PROBE
+(nothing if it is empty) and closes the window. Does nothing if the variable isn't set.
+Runs from source are probed by benchmarks/startup.py itself, built executables get the probe as PyInstaller runtime hook
+(python build.py --startup-probe), so the program itself doesn't know about it.
+"""
+
+import os
+import tkinter
+
+
+PROBE_VARIABLE = "MEDIA_SCRAPER_STARTUP_PROBE"
+
+
+def install(probe_url):
+	"""
+	Patches tkinter, so the first mainloop runs the probe as soon as it is idle (window is shown).
+	:param probe_url: Url to download before closing the window, "" to close it right away.
+	"""
+
+	mainloop = tkinter.Misc.mainloop
+
+	def probed_mainloop(self, n=0):
+		tkinter.Misc.mainloop = mainloop
+		self.after_idle(lambda: _run_probe(self, probe_url))
+		mainloop(self, n)
+
+	tkinter.Misc.mainloop = probed_mainloop
+
+def _run_probe(root, probe_url):
+	if probe_url != "":
+		from scripts.session import create_session
+		with create_session() as session:
+			session.get(probe_url)
+	root.destroy()
+
+
+if os.environ.get(PROBE_VARIABLE) is not None:
+	install(os.environ[PROBE_VARIABLE])
@@ -7,7 +7,7 @@ import sys
 import PyInstaller.__main__
 
 
-def build(name, console, onefile, uac_admin, icon, upx, files, folders):
+def build(name, console, onefile, uac_admin, icon, upx, files, folders, runtime_hooks=()):
 	work_path = "build"
 	while os.path.isdir(work_path):
 		work_path = f"build_{random.randint(1, 1_000_000_000)}"
@@ -46,7 +46,9 @@ def build(name, console, onefile, uac_admin, icon, upx, files, folders):
 		else:
 			run_list.extend(('--icon', icon_path))
 
-	if upx != "":
+	if upx is None:
+		run_list.append("--noupx")
+	elif upx != "":
 		if not os.path.isfile(upx):
 			raise Exception("Invalid UPX!")
 		else:
@@ -80,6 +82,9 @@ def build(name, console, onefile, uac_admin, icon, upx, files, folders):
 		else:
 			raise Exception("Invalid folder!")
 
+	for runtime_hook in runtime_hooks:
+		run_list.extend(('--runtime-hook', os.path.join(os.path.abspath("."), runtime_hook)))
+
 	PyInstaller.__main__.run(run_list)
 	shutil.rmtree(path=work_path, ignore_errors=True)
 
@@ -95,6 +100,7 @@ def main():
 
 	files = []
 	folders = []
+	runtime_hooks = []
 
 	match platform.system():
 		case "Windows":
@@ -118,10 +124,19 @@ def main():
 
 	folders.append("data")
 
+	if "--onedir" in sys.argv[1:]:
+		# folder with executable and its files, starts faster as nothing has to be unpacked (or decompressed) on launch
+		onefile = False
+		upx = None  # not even UPX found in PATH
+
+	if "--startup-probe" in sys.argv[1:]:
+		# build for benchmarks/startup.py, which can then measure time to window of the executable
+		runtime_hooks.append("benchmarks/startup_probe.py")
+
 	if len(sys.argv) > 1 and sys.argv[1] == "--version":
 		print(version)
 	else:
-		build(name, console, onefile, uac_admin, icon, upx, files, folders)
+		build(name, console, onefile, uac_admin, icon, upx, files, folders, runtime_hooks)
 
 
 if __name__ == '__main__':
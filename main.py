@@ -1,7 +1,7 @@
 import os
 import platform
+import queue
 import sys
-import threading
 import tkinter
 import tkinter.filedialog
 import tkinter.messagebox
@@ -9,9 +9,10 @@ import tkinter.messagebox
 import psutil
 import validators
 
-from scripts.image import download_images
-from scripts.video import download_videos
+from scripts.jobs import JOB_FAILED, JOB_FINISHED, JOB_QUEUED, JOB_RUNNING, JobQueue
 
+SIZE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB"]
+JOB_COLORS = {JOB_QUEUED: "#3D2A05", JOB_RUNNING: "white", JOB_FINISHED: "white", JOB_FAILED: "#8B0000"}  # text color of job rows
 
 def resource_path(relative_path):
 	""" Get absolute path to resource, works for dev and for PyInstaller """
@@ -22,11 +23,21 @@ def resource_path(relative_path):
 		base_path = os.path.abspath(".")
 	return os.path.join(base_path, relative_path)
 
+def format_size(size):
+	""" Formats number of bytes with binary unit, e.g. 1.5 MiB """
+	for unit in SIZE_UNITS[:-1]:
+		if size < 1024:
+			break
+		size /= 1024
+	else:
+		unit = SIZE_UNITS[-1]
+	return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
 class App:
 	def __init__(self):
 
 		self.width = 700
-		self.height = 300
+		self.height = 460
 
 		self.root = tkinter.Tk()
 		self.root.title("Media Scraper")
@@ -98,16 +109,24 @@ class App:
 		self.videos_switch.bind("<Button-1>", lambda event: self.toggle_videos())
 		self.videos_switch.place(x=360, y=255, width=80, height=35)
 
-		self.download_thread = None
+		self.jobs_scrollbar = tkinter.Scrollbar(self.root, orient=tkinter.VERTICAL, cursor="hand2")
+		self.jobs_scrollbar.place(x=675, y=305, width=15, height=145)
+		self.jobs_list = tkinter.Listbox(self.root, font=("Helvetica", 10), yscrollcommand=self.jobs_scrollbar.set, activestyle=tkinter.NONE,
+		                                 foreground="white", background="#B2861C", selectbackground="#664C10", selectforeground="white",
+		                                 highlightthickness=2, highlightcolor="white", highlightbackground="white", borderwidth=0)
+		self.jobs_scrollbar.config(command=self.jobs_list.yview)
+		self.jobs_list.place(x=10, y=305, width=665, height=145)
+
+		# jobs report progress from their threads, the updates are passed to this thread through the queue of JobQueue
+		# and <<JobUpdate>> virtual event wakes the mainloop up when there is something in it
+		self.jobs = JobQueue(notify=self.notify_job_update)
+		self.root.bind("<<JobUpdate>>", lambda event: self.show_job_updates())
 
 		self.root.mainloop()
 
 		psutil.Process(os.getpid()).kill()
 
 	def download(self):
-		if self.hourglass_active:
-			return
-
 		inputed_link = self.link_entry.get()
 		inputed_folder = self.folder_entry.get()
 
@@ -129,49 +148,57 @@ class App:
 			else:
 				return
 
-		self.start_hourglass()
-		self.download_button.config(background="#664C10", activebackground="#664C10", cursor="arrow", highlightcolor="#000000", highlightbackground="#000000")
-		self.browse_button.config(background="#664C10", activebackground="#664C10", cursor="arrow", highlightcolor="#000000", highlightbackground="#000000")
-		self.link_entry.config(state=tkinter.DISABLED, highlightcolor="#000000", highlightbackground="#000000")
-		self.folder_entry.config(state=tkinter.DISABLED, highlightcolor="#000000", highlightbackground="#000000")
-		self.images_switch.config(cursor="arrow")
-		self.videos_switch.config(cursor="arrow")
-
-		self.download_thread = threading.Thread(target=self.download_thread_function, args=(inputed_link, inputed_folder))
-		self.download_thread.start()
-		self.download_thread_check()
-
-	def download_thread_function(self, inputed_link, inputed_folder):
-		if self.images_switch_state:
-			download_images(inputed_link, inputed_folder)
-		if self.videos_switch_state:
-			match platform.system():
-				case "Windows":
-					ffmpeg_path = resource_path("lib/ffmpeg/windows/ffmpeg.exe")
-				case "Linux":
-					ffmpeg_path = resource_path("lib/ffmpeg/linux/ffmpeg")
-				case "Darwin":
-					ffmpeg_path = resource_path("lib/ffmpeg/macos/ffmpeg")
-				case _:
-					ffmpeg_path = ""
-			download_videos(inputed_link, inputed_folder, ffmpeg_path)
-
-	def download_thread_check(self):
-		if self.download_thread.is_alive():
-			self.root.after(100, self.download_thread_check)
-		else:
+		if not self.images_switch_state and not self.videos_switch_state:
+			tkinter.messagebox.showerror("Error!", "Both images and videos are turned off.")
+			return
+
+		match platform.system():
+			case "Windows":
+				ffmpeg_path = resource_path("lib/ffmpeg/windows/ffmpeg.exe")
+			case "Linux":
+				ffmpeg_path = resource_path("lib/ffmpeg/linux/ffmpeg")
+			case "Darwin":
+				ffmpeg_path = resource_path("lib/ffmpeg/macos/ffmpeg")
+			case _:
+				ffmpeg_path = ""
+
+		# the job is queued and the link entry is cleared, so the next link can be entered right away
+		self.jobs.submit(inputed_link, inputed_folder, self.images_switch_state, self.videos_switch_state, ffmpeg_path)
+		self.link_entry.delete(0, tkinter.END)
+		if not self.hourglass_active:
+			self.start_hourglass()
+
+	def notify_job_update(self):
+		# called from job threads, event_generate is the only thing done with Tk outside of the main thread
+		try:
+			self.root.event_generate("<<JobUpdate>>", when="tail")
+		except (RuntimeError, tkinter.TclError):
+			# window is being closed
+			pass
+
+	def show_job_updates(self):
+		while True:
+			try:
+				job_id = self.jobs.updates.get_nowait()
+			except queue.Empty:
+				break
+			status = self.jobs.status(job_id)
+
+			state = f"{format_size(status.speed)}/s" if status.state == JOB_RUNNING else status.state
+			text = f"{status.url}   {state}   {format_size(status.downloaded_bytes)}   " \
+			       f"{status.files} saved, {status.skipped} skipped, {status.failed} failed"
+			if status.error is not None:
+				text += f"   ({status.error})"
+
+			if job_id < self.jobs_list.size():
+				self.jobs_list.delete(job_id)
+			self.jobs_list.insert(job_id, text)
+			self.jobs_list.itemconfig(job_id, foreground=JOB_COLORS[status.state])
+
+		if not self.jobs.active() and self.hourglass_active:
 			self.stop_hourglass()
-			self.download_button.config(background="#B2861C", activebackground="#664C10", cursor="hand2", highlightcolor="white", highlightbackground="white")
-			self.browse_button.config(background="#B2861C", activebackground="#664C10", cursor="hand2", highlightcolor="white", highlightbackground="white")
-			self.link_entry.config(state=tkinter.NORMAL, highlightcolor="white", highlightbackground="white")
-			self.folder_entry.config(state=tkinter.NORMAL, highlightcolor="white", highlightbackground="white")
-			self.images_switch.config(cursor="hand2")
-			self.videos_switch.config(cursor="hand2")
 
 	def browse(self):
-		if self.hourglass_active:
-			return
-
 		result_folder = tkinter.filedialog.askdirectory(mustexist=True, initialdir=self.folder_entry.get() if os.path.isdir(self.folder_entry.get()) else os.path.dirname(sys.executable))
 		if result_folder != "":
 			self.folder_entry.delete(0, tkinter.END)
@@ -194,17 +221,11 @@ class App:
 			self.root.after(50, self.spin_hourglass)
 
 	def toggle_images(self):
-		if self.hourglass_active:
-			return
-
 		self.images_switch_state = not self.images_switch_state
 		self.images_switch.config(highlightcolor="green" if self.images_switch_state else "red", highlightbackground="green" if self.images_switch_state else "red",
 		                          foreground="white" if self.images_switch_state else "black")
 
 	def toggle_videos(self):
-		if self.hourglass_active:
-			return
-
 		self.videos_switch_state = not self.videos_switch_state
 		self.videos_switch.config(highlightcolor="green" if self.videos_switch_state else "red", highlightbackground="green" if self.videos_switch_state else "red",
 		                          foreground="white" if self.videos_switch_state else "black")
@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from scripts.index import sidecar_path
+
+
+ARCHIVE_FILE = "video_archive.db"
+EXTRACTION_TTL = 3 * 60 * 60  # seconds, format urls of many sites are signed and expire after a few hours
+EXTRACTION_MAX_ENTRIES = 5_000  # least recently stored extraction results above this limit are evicted
+
+
+def archive_id(info) -> str | None:
+	"""
+	Returns id of video in download archive, in the same format as yt-dlp's --download-archive ("extractor id").
+	Url is added to ids which aren't part of the url, so videos embedded in different pages don't get the same id.
+	Works for unprocessed playlist entries (with ie_key) as well as extracted videos (with extractor_key).
+	:param info: Info dict (or unprocessed entry) of the video.
+	:return: Archive id, None if extractor or video id isn't known.
+	"""
+
+	extractor = info.get("extractor_key") or info.get("ie_key")
+	video_id = info.get("id")
+	if extractor is None or video_id is None:
+		return None
+	url = info.get("webpage_url") or info.get("url")
+	if url is not None and video_id not in url:
+		# video isn't identified by its url (e.g. videos embedded in a page), its id is only unique within the page
+		return f"{extractor.lower()} {url}#{video_id}"
+	return f"{extractor.lower()} {video_id}"
+
+
+class VideoArchive:
+	"""
+	Archive of videos downloaded to a save folder, so synchronizing a playlist or channel again only downloads new videos.
+	Archive is stored in SQLite database inside sidecar folder of the save folder.
+	"""
+
+	def __init__(self, save_folder):
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(sidecar_path(save_folder, ARCHIVE_FILE), timeout=60, check_same_thread=False, isolation_level=None)
+		self.connection.executescript("""
+			CREATE TABLE IF NOT EXISTS videos (id TEXT PRIMARY KEY, url TEXT, path TEXT, stored REAL);
+			CREATE TABLE IF NOT EXISTS extractions (url TEXT PRIMARY KEY, info BLOB, stored REAL);
+			CREATE INDEX IF NOT EXISTS extractions_stored ON extractions (stored);
+		""")
+
+	def downloaded(self, info, path=None) -> bool:
+		"""
+		Checks whether video was already downloaded (and its file still exists).
+		:param info: Info dict (or unprocessed entry) of the video.
+		:param path: Path the video would be saved to, if it is known. Existing file which isn't archived yet
+		             (e.g. downloaded before the archive was used) is added to the archive.
+		:return: True if video doesn't have to be downloaded.
+		"""
+
+		video_id = archive_id(info)
+		if video_id is None:
+			return False
+		with self.lock:
+			row = self.connection.execute("SELECT path FROM videos WHERE id = ?", (video_id,)).fetchone()
+		if row is not None and os.path.isfile(row[0]):
+			return True
+		if path is not None and os.path.isfile(path):
+			self.add(info, path)
+			return True
+		return False
+
+	def add(self, info, path):
+		"""
+		Records downloaded video.
+		:param info: Info dict of the video.
+		:param path: Path of the saved file.
+		"""
+
+		self.add_id(archive_id(info), info.get("webpage_url"), path)
+
+	def add_id(self, video_id, url, path):
+		"""
+		Records downloaded video by its archive id (so info dict of the video doesn't have to be kept until it is saved).
+		:param video_id: Archive id of the video (see archive_id), nothing is recorded if it is None.
+		:param url: Url of the video.
+		:param path: Path of the saved file.
+		"""
+
+		if video_id is None:
+			return
+		with self.lock:
+			self.connection.execute("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?)", (video_id, url, path, time.time()))
+
+	def get_extraction(self, url, ttl=EXTRACTION_TTL) -> dict | None:
+		"""
+		Returns cached extraction result.
+		:param url: Url of the extracted entry.
+		:param ttl: Maximum age of the result in seconds.
+		:return: Info dict, None if url isn't cached or result has expired.
+		"""
+
+		with self.lock:
+			row = self.connection.execute("SELECT info FROM extractions WHERE url = ? AND stored >= ?", (url, time.time() - ttl)).fetchone()
+		if row is None:
+			return None
+		return json.loads(zlib.decompress(row[0]))
+
+	def put_extraction(self, url, info):
+		"""
+		Caches extraction result.
+		:param url: Url of the extracted entry.
+		:param info: JSON serializable info dict (see YoutubeDL.sanitize_info).
+		"""
+
+		body = zlib.compress(json.dumps(info).encode("utf-8"))
+		with self.lock:
+			self.connection.execute("INSERT OR REPLACE INTO extractions VALUES (?, ?, ?)", (url, body, time.time()))
+
+	def evict(self, ttl=EXTRACTION_TTL, max_entries=EXTRACTION_MAX_ENTRIES):
+		"""
+		Removes expired extraction results and the oldest ones above size limit.
+		"""
+
+		with self.lock:
+			self.connection.execute("DELETE FROM extractions WHERE stored < ?", (time.time() - ttl,))
+			self.connection.execute("DELETE FROM extractions WHERE url IN (SELECT url FROM extractions ORDER BY stored DESC LIMIT -1 OFFSET ?)", (max_entries,))
+
+	def close(self):
+		self.evict()
+		self.connection.close()
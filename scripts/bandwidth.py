@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+from collections import Counter
+
+
+# categories of downloaded data
+CATEGORY_PAGE = "page"
+CATEGORY_IMAGE = "image"
+CATEGORY_VIDEO = "video"
+PRIORITIES = {CATEGORY_PAGE: 0, CATEGORY_IMAGE: 1, CATEGORY_VIDEO: 2}  # lower number is served first when bandwidth is scarce
+BURST = 1  # seconds, buckets hold this many seconds worth of tokens (idle bandwidth can be used at once up to this amount)
+PREEMPTED_WAIT = 0.05  # seconds, how long lower priority download waits before checking whether higher priority ones are still waiting
+SIZE = re.compile(r'(\d*\.?\d+)\s*([kmg]?)i?b?', re.IGNORECASE)
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(text) -> int:
+	"""
+	Parses number of bytes given like yt-dlp's --limit-rate (e.g. "500K", "4.2M").
+	:param text: Number of bytes with optional K, M or G suffix.
+	:return: Number of bytes.
+	:raises ValueError: If text isn't a valid size.
+	"""
+
+	match = SIZE.fullmatch(text.strip())
+	if match is None or float(match.group(1)) <= 0:
+		raise ValueError(f"invalid size: {text}")
+	return round(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+def parse_rate(text) -> float:
+	"""
+	Parses download rate (e.g. "500K" for 500 KiB/s), see parse_size.
+	:param text: Bytes per second with optional K, M or G suffix.
+	:return: Bytes per second.
+	:raises ValueError: If text isn't a valid rate.
+	"""
+
+	return float(parse_size(text))
+
+
+class _Bucket:
+	def __init__(self, rate):
+		self.rate = rate
+		self.capacity = rate * BURST
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+
+	def refill(self, now):
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def wait_time(self, amount) -> float:
+		# amounts bigger than the bucket are taken as soon as it is full (tokens go negative, the debt is waited off later)
+		missing = min(amount, self.capacity) - self.tokens
+		return max(missing / self.rate, 0.0)
+
+
+class BandwidthLimiter:
+	"""
+	Token bucket limits of download rate shared by all downloads of the process (images over HTTP, videos through yt-dlp).
+	There is a limit of the total rate and optional limit of every category.
+	When downloads of several categories wait for the total budget, the category with higher priority gets it first,
+	so small images aren't stuck behind big videos.
+	"""
+
+	def __init__(self, total_rate=None, category_rates=None, priorities=None):
+		"""
+		:param total_rate: Maximum rate of all downloads together in bytes per second, None for no limit.
+		:param category_rates: Dictionary mapping category (CATEGORY_* constants) to its maximum rate in bytes per second.
+		:param priorities: Dictionary mapping category to its priority (lower is served first), defaults to PRIORITIES.
+		"""
+
+		self.condition = threading.Condition()
+		self.total = _Bucket(total_rate) if total_rate is not None else None
+		self.categories = {category: _Bucket(rate) for category, rate in (category_rates or {}).items() if rate is not None}
+		self.priorities = dict(PRIORITIES if priorities is None else priorities)
+		self.waiting = Counter()
+
+	def rate(self, category) -> float | None:
+		"""
+		Returns maximum rate downloads of given category can get.
+		:param category: One of CATEGORY_* constants.
+		:return: Bytes per second, None if category isn't limited.
+		"""
+
+		rates = [bucket.rate for bucket in (self.total, self.categories.get(category)) if bucket is not None]
+		return min(rates) if rates else None
+
+	def consume(self, category, amount):
+		"""
+		Waits until given amount of data can be downloaded, call it for every downloaded chunk.
+		:param category: One of CATEGORY_* constants.
+		:param amount: Number of bytes.
+		"""
+
+		buckets = [bucket for bucket in (self.total, self.categories.get(category)) if bucket is not None]
+		if not buckets or amount <= 0:
+			return
+
+		priority = self.priorities.get(category, len(self.priorities))
+		with self.condition:
+			self.waiting[category] += 1
+			try:
+				while True:
+					now = time.monotonic()
+					for bucket in (self.total, *self.categories.values()):
+						if bucket is not None:
+							bucket.refill(now)
+					wait = max(bucket.wait_time(amount) for bucket in buckets)
+					if wait == 0 and not self._preempted(priority):
+						for bucket in buckets:
+							bucket.tokens -= amount
+						return
+					self.condition.wait(wait or PREEMPTED_WAIT)
+			finally:
+				self.waiting[category] -= 1
+				self.condition.notify_all()
+
+	def progress_hook(self, category):
+		"""
+		Creates yt-dlp progress hook (for 'progress_hooks' option) which limits the download it is attached to.
+		yt-dlp calls the hook from its download loop, so waiting in it slows the download down.
+		:param category: Category of the download.
+		:return: Progress hook.
+		"""
+
+		downloaded = {}
+		lock = threading.Lock()
+
+		def hook(progress):
+			if progress.get("status") != "downloading" or progress.get("downloaded_bytes") is None:
+				return
+			with lock:
+				key = progress.get("filename")
+				amount = progress["downloaded_bytes"] - downloaded.get(key, 0)
+				downloaded[key] = progress["downloaded_bytes"]
+			self.consume(category, amount)
+
+		return hook
+
+	def _preempted(self, priority) -> bool:
+		# higher priority downloads only block this one if they are waiting for the total budget, not for their own category limit
+		if self.total is None:
+			return False
+		for category, count in self.waiting.items():
+			if count and self.priorities.get(category, len(self.priorities)) < priority:
+				bucket = self.categories.get(category)
+				if bucket is None or bucket.tokens > 0:
+					return True
+		return False
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from scripts.index import sidecar_path
+
+
+CACHE_FILE = "http_cache.db"
+CACHE_MAX_ENTRIES = 50_000  # least recently used entries above this limit are evicted
+CACHE_TTL = 30 * 24 * 60 * 60  # entries older than this (in seconds) are ignored and evicted
+CACHE_MAX_BODY = 8 * 1024 * 1024  # bigger page bodies are not stored
+CACHE_EVICT_INTERVAL = 1000  # number of stored entries after which cache size is checked
+
+CacheEntry = namedtuple("CacheEntry", ["etag", "last_modified", "content_hash", "body"])
+
+
+class HttpCache:
+	"""
+	Cache of HTTP validators (ETag, Last-Modified) and content hashes, keyed by url.
+	Used to make conditional requests, so unchanged pages and images aren't transferred again.
+	Cache is stored in SQLite database inside sidecar folder of the save folder.
+	"""
+
+	def __init__(self, save_folder, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.lock = threading.Lock()
+		self.stored_since_eviction = 0
+		self.connection = sqlite3.connect(sidecar_path(save_folder, CACHE_FILE), timeout=60, check_same_thread=False, isolation_level=None)
+		self.connection.executescript("""
+			CREATE TABLE IF NOT EXISTS entries (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, body BLOB, stored REAL, used REAL);
+			CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+		""")
+		self.evict()
+
+	def get(self, url) -> CacheEntry | None:
+		"""
+		Returns cached entry for given url.
+		:param url: Url of the resource.
+		:return: Cached entry, None if url isn't cached or entry has expired.
+		"""
+
+		with self.lock:
+			row = self.connection.execute("SELECT etag, last_modified, content_hash, body FROM entries WHERE url = ? AND stored >= ?",
+			                              (url, time.time() - self.ttl)).fetchone()
+			if row is None:
+				return None
+			self.connection.execute("UPDATE entries SET used = ? WHERE url = ?", (time.time(), url))
+
+		etag, last_modified, content_hash, body = row
+		if body is not None:
+			body = zlib.decompress(body).decode("utf-8")
+		return CacheEntry(etag, last_modified, content_hash, body)
+
+	def put(self, url, response, content_hash, body=None):
+		"""
+		Stores validators of given response, responses without validators aren't cached.
+		:param url: Url of the resource.
+		:param response: Response (with status 200) whose validators are stored.
+		:param content_hash: Hex digest of response body.
+		:param body: Response body (text) to store, used for pages which have to be parsed again on 304.
+		"""
+
+		etag = response.headers.get("ETag")
+		last_modified = response.headers.get("Last-Modified")
+		if etag is None and last_modified is None:
+			self.remove(url)
+			return
+
+		if body is not None:
+			body = body.encode("utf-8")
+			body = zlib.compress(body) if len(body) <= CACHE_MAX_BODY else None
+			if body is None:  # page can't be restored from cache, so there is no point in making conditional request
+				self.remove(url)
+				return
+
+		now = time.time()
+		with self.lock:
+			self.connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", (url, etag, last_modified, content_hash, body, now, now))
+			self.stored_since_eviction += 1
+		if self.stored_since_eviction >= CACHE_EVICT_INTERVAL:
+			self.evict()
+
+	def refresh(self, url):
+		"""
+		Marks entry as fresh (after server confirmed it with 304 response).
+		:param url: Url of the resource.
+		"""
+
+		now = time.time()
+		with self.lock:
+			self.connection.execute("UPDATE entries SET stored = ?, used = ? WHERE url = ?", (now, now, url))
+
+	def remove(self, url):
+		with self.lock:
+			self.connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+
+	def evict(self):
+		"""
+		Removes expired entries and least recently used entries above size limit.
+		"""
+
+		with self.lock:
+			self.connection.execute("DELETE FROM entries WHERE stored < ?", (time.time() - self.ttl,))
+			self.connection.execute("DELETE FROM entries WHERE url IN (SELECT url FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+			self.stored_since_eviction = 0
+
+	def close(self):
+		self.evict()
+		self.connection.close()
+
+
+def conditional_headers(entry) -> dict:
+	"""
+	Creates headers for conditional request from cached entry.
+	:param entry: Cached entry (or None).
+	:return: Headers to add to request.
+	"""
+
+	headers = {}
+	if entry is not None:
+		if entry.etag is not None:
+			headers["If-None-Match"] = entry.etag
+		if entry.last_modified is not None:
+			headers["If-Modified-Since"] = entry.last_modified
+	return headers
@@ -0,0 +1,196 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import as_completed, ThreadPoolExecutor
+
+from scripts.bandwidth import BandwidthLimiter, CATEGORY_IMAGE, CATEGORY_PAGE, CATEGORY_VIDEO, parse_rate, parse_size
+from scripts.crawl import crawl_images, PAGE_WORKERS
+from scripts.extract import HTML_PARSER, HTML_PARSERS, IMAGE_WIDTH
+from scripts.image import download_images, DOWNLOAD_WORKERS
+from scripts.metrics import JobMetrics, profile, PROFILE_CPU, PROFILE_MODES
+from scripts.postprocess import FFMPEG_WORKERS
+from scripts.probe import ImageFilter
+from scripts.scheduler import HostScheduler
+from scripts.session import create_session
+from scripts.video import download_videos, FRAGMENT_WORKERS, VIDEO_WORKERS
+
+
+JOB_WORKERS = 2  # number of urls processed at the same time
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+	"""
+	Parses command line arguments.
+	:param argv: Command line arguments (sys.argv[1:] if not given).
+	:return: Parsed arguments.
+	"""
+
+	parser = argparse.ArgumentParser(prog="python -m scripts", description="Download media files from websites without GUI. "
+	                                 "Result of every url is written to stdout as single line of JSON.")
+	parser.add_argument("urls", nargs="*", help="urls to download from (read from --input or stdin if none are given)")
+	parser.add_argument("-i", "--input", help="file with one url per line ('-' for stdin), empty lines and lines starting with # are ignored")
+	parser.add_argument("-o", "--output", required=True, help="folder to save media to (created if it doesn't exist)")
+	parser.add_argument("--images", action=argparse.BooleanOptionalAction, default=True, help="download images (default: yes)")
+	parser.add_argument("--videos", action=argparse.BooleanOptionalAction, default=True, help="download videos (default: yes)")
+	parser.add_argument("--jobs", type=int, default=JOB_WORKERS, help=f"number of urls processed at the same time (default: {JOB_WORKERS})")
+	parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help=f"number of images downloaded at the same time per url (default: {DOWNLOAD_WORKERS})")
+	parser.add_argument("--video-workers", type=int, default=VIDEO_WORKERS, help=f"number of videos downloaded at the same time per url (default: {VIDEO_WORKERS})")
+	parser.add_argument("--fragment-workers", type=int, default=FRAGMENT_WORKERS,
+	                    help=f"number of fragments of HLS/DASH video downloaded at the same time (default: {FRAGMENT_WORKERS})")
+	parser.add_argument("--ffmpeg-workers", type=int, default=FFMPEG_WORKERS,
+	                    help=f"number of videos remuxed/merged by ffmpeg at the same time per url (default: {FFMPEG_WORKERS})")
+	parser.add_argument("--stream", action="store_true",
+	                    help="let ffmpeg download plain HTTP videos while muxing them (no temporary files, but no progress and interrupted videos start over)")
+	parser.add_argument("--sync", action="store_true",
+	                    help="only download videos which aren't in the save folder yet (e.g. new videos of a playlist or channel), "
+	                         "already downloaded entries aren't even extracted")
+	parser.add_argument("--crawl-depth", type=int, default=0, help="also download images from linked pages up to this depth (default: 0, no crawling)")
+	parser.add_argument("--allow-domain", action="append", metavar="DOMAIN", dest="allowed_domains",
+	                    help="domain (with its subdomains) the crawl can follow links to, can be repeated (default: domain of the starting page)")
+	parser.add_argument("--page-workers", type=int, default=PAGE_WORKERS, help=f"number of pages downloaded at the same time when crawling (default: {PAGE_WORKERS})")
+	parser.add_argument("--parser", choices=HTML_PARSERS, default=HTML_PARSER, help=f"HTML parser (default: {HTML_PARSER})")
+	parser.add_argument("--image-width", type=int, default=IMAGE_WIDTH,
+	                    help="choose variants of responsive images (srcset, picture) like browser window of this width (default: the largest variant)")
+	parser.add_argument("--probe", action="store_true",
+	                    help="check first bytes of every image before downloading it: skip files which aren't images "
+	                         "and download embedded images without image extension (implied by the filters below)")
+	parser.add_argument("--min-width", type=int, help="skip images narrower than this (e.g. 2 to skip tracking pixels)")
+	parser.add_argument("--min-height", type=int, help="skip images lower than this")
+	parser.add_argument("--max-width", type=int, help="skip images wider than this")
+	parser.add_argument("--max-height", type=int, help="skip images higher than this")
+	parser.add_argument("--min-size", type=parse_size, metavar="SIZE", help="skip image files smaller than this, e.g. 2K")
+	parser.add_argument("--max-size", type=parse_size, metavar="SIZE", help="skip image files bigger than this, e.g. 20M")
+	parser.add_argument("--limit-rate", type=parse_rate, metavar="RATE", help="maximum download rate of all urls together, e.g. 500K or 4.2M (bytes per second)")
+	parser.add_argument("--image-rate", type=parse_rate, metavar="RATE", help="maximum download rate of images")
+	parser.add_argument("--video-rate", type=parse_rate, metavar="RATE", help="maximum download rate of videos")
+	parser.add_argument("--prefer", choices=["images", "videos"], default="images",
+	                    help="which media gets the bandwidth first when --limit-rate is reached (default: images)")
+	parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg") or "ffmpeg", help="path of ffmpeg executable (default: ffmpeg from PATH)")
+	parser.add_argument("--metrics", action="store_true", help="add per-stage timings, counters, byte totals and request latencies to result of every url")
+	parser.add_argument("--prometheus", metavar="FILE", help="write metrics of the whole batch to file in Prometheus text format")
+	parser.add_argument("--profile", choices=PROFILE_MODES, help="profile the batch (cpu: cProfile of all threads, memory: tracemalloc allocations)")
+	parser.add_argument("--profile-output", metavar="FILE", help="file to save the profile to (default: media-scraper.pstats or media-scraper-memory.txt)")
+	return parser.parse_args(argv)
+
+def read_urls(args) -> list[str]:
+	"""
+	Collects urls from command line, input file or stdin.
+	:param args: Parsed arguments.
+	:return: List of urls.
+	"""
+
+	urls = list(args.urls)
+	if args.input is not None or not urls:
+		if args.input is None or args.input == "-":
+			lines = sys.stdin.readlines()
+		else:
+			with open(args.input, encoding="utf-8") as input_file:
+				lines = input_file.readlines()
+		urls.extend(line.strip() for line in lines if line.strip() and not line.strip().startswith("#"))
+	return urls
+
+def image_filter(args) -> ImageFilter | None:
+	"""
+	Creates image filter from command line arguments.
+	:param args: Parsed arguments.
+	:return: ImageFilter, None if images shouldn't be probed.
+	"""
+
+	image_filter = ImageFilter(args.min_width, args.min_height, args.max_width, args.max_height, args.min_size, args.max_size)
+	if not args.probe and image_filter == ImageFilter():
+		return None
+	return image_filter
+
+def process_url(url, args, session, scheduler, metrics, limiter) -> dict:
+	"""
+	Downloads images and/or videos from single url.
+	:param url: Url to download from.
+	:param args: Parsed arguments.
+	:param session: HTTP session shared by all jobs.
+	:param scheduler: HostScheduler shared by all jobs (so limits of a host apply to the whole batch).
+	:param metrics: JobMetrics of this url.
+	:param limiter: BandwidthLimiter shared by all jobs.
+	:return: JSON serializable result (None instead of images/videos result means the url couldn't be downloaded/extracted).
+	"""
+
+	start = time.perf_counter()
+	result = {"url": url}
+	try:
+		if args.images:
+			if args.crawl_depth > 0:
+				result["images"] = crawl_images(url, args.output, max_depth=args.crawl_depth, allowed_domains=args.allowed_domains, workers=args.workers,
+				                                page_workers=args.page_workers, session=session, parser=args.parser, scheduler=scheduler, image_width=args.image_width,
+				                                metrics=metrics, limiter=limiter, image_filter=image_filter(args))
+			else:
+				result["images"] = download_images(url, args.output, workers=args.workers, session=session, parser=args.parser, scheduler=scheduler,
+				                                   image_width=args.image_width, metrics=metrics, limiter=limiter, image_filter=image_filter(args))
+		if args.videos:
+			result["videos"] = download_videos(url, args.output, args.ffmpeg, workers=args.video_workers, fragment_workers=args.fragment_workers,
+			                                   ffmpeg_workers=args.ffmpeg_workers, stream=args.stream, metrics=metrics, sync=args.sync,
+			                                   limiter=limiter)
+	except Exception as error:  # one broken url shouldn't stop the whole batch
+		result["error"] = f"{type(error).__name__}: {error}"
+	result["seconds"] = round(time.perf_counter() - start, 3)
+	if args.metrics:
+		result["metrics"] = metrics.summary()
+	return result
+
+def succeeded_url(result) -> bool:
+	"""
+	Checks whether url was processed successfully, like in GUI job queue it fails only if nothing could be downloaded from it
+	(e.g. page with images but without videos succeeds, even though videos couldn't be extracted).
+	:param result: Result of process_url.
+	:return: False if processing crashed or every requested media failed.
+	"""
+
+	if "error" in result:
+		return False
+	media = [result[kind] for kind in ("images", "videos") if kind in result]
+	return any(value is not None for value in media)
+
+def main(argv=None) -> int:
+	"""
+	Runs batch download.
+	:param argv: Command line arguments (sys.argv[1:] if not given).
+	:return: Exit code, 0 if every url was processed successfully.
+	"""
+
+	args = parse_args(argv)
+	urls = read_urls(args)
+
+	if not args.images and not args.videos:
+		print("Nothing to do, both images and videos are disabled.", file=sys.stderr)
+		return 2
+	os.makedirs(args.output, exist_ok=True)
+
+	succeeded = True
+	scheduler = HostScheduler()
+	priorities = [CATEGORY_PAGE, CATEGORY_IMAGE, CATEGORY_VIDEO] if args.prefer == "images" else [CATEGORY_PAGE, CATEGORY_VIDEO, CATEGORY_IMAGE]
+	limiter = BandwidthLimiter(args.limit_rate, {CATEGORY_IMAGE: args.image_rate, CATEGORY_VIDEO: args.video_rate},
+	                           {category: priority for priority, category in enumerate(priorities)})
+	total = JobMetrics()
+	with contextlib.ExitStack() as stack:
+		if args.profile is not None:
+			stack.enter_context(profile(args.profile, args.profile_output or ("media-scraper.pstats" if args.profile == PROFILE_CPU else "media-scraper-memory.txt")))
+		session = stack.enter_context(create_session(pool_size=args.jobs * (args.workers + args.page_workers)))
+		executor = stack.enter_context(ThreadPoolExecutor(max_workers=args.jobs))
+
+		futures = {}
+		for url in urls:
+			metrics = JobMetrics()
+			futures[executor.submit(process_url, url, args, session, scheduler, metrics, limiter)] = metrics
+		# results are written as soon as they are ready
+		for future in as_completed(futures):
+			result = future.result()
+			total.merge(futures[future])
+			succeeded &= succeeded_url(result)
+			print(json.dumps(result), flush=True)
+
+	if args.prometheus is not None:
+		with open(args.prometheus, "w", encoding="utf-8") as prometheus_file:
+			prometheus_file.write(total.prometheus())
+	return 0 if succeeded else 1
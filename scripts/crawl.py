@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+from collections import Counter
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from scripts.cache import HttpCache
+from scripts.events import EVENT_DONE, JobEvents
+from scripts.extract import extract_links, HTML_PARSER, IMAGE_WIDTH
+from scripts.image import download_image, DOWNLOAD_WORKERS, fetch_page
+from scripts.index import FolderIndex
+from scripts.journal import JobJournal, STATE_PENDING
+from scripts.metrics import JobMetrics, STAGE_PARSE
+from scripts.scheduler import HostScheduler
+from scripts.session import create_session
+
+
+CRAWL_DEPTH = 2  # how many links away from the starting page the crawl goes
+PAGE_WORKERS = 4  # number of pages downloaded at the same time
+IMAGES_IN_FLIGHT = 4  # images submitted ahead per worker (crawling of further pages waits until they are downloaded)
+MAX_PAGE_SIZE = 10 * 1024 * 1024  # bytes, bigger linked pages aren't crawled
+# extensions of links which obviously aren't pages, they aren't requested at all (other links are checked by their Content-Type)
+SKIPPED_EXT = ['mp4', 'webm', 'mkv', 'avi', 'mov', 'mp3', 'm4a', 'ogg', 'wav', 'flac', 'zip', 'rar', '7z', 'gz', 'tar', 'exe', 'msi', 'dmg',
+               'iso', 'apk', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'csv', 'json', 'xml', 'txt', 'css', 'js', 'woff', 'woff2', 'ttf', 'ico']
+
+
+def crawl_images(website, save_folder, max_depth=CRAWL_DEPTH, allowed_domains=None,
+                 workers=DOWNLOAD_WORKERS, page_workers=PAGE_WORKERS, session=None, parser=HTML_PARSER, events=None, scheduler=None,
+                 image_width=IMAGE_WIDTH, metrics=None, limiter=None, image_filter=None) -> dict | None:
+	"""
+	Downloads images from given website and from pages it links to (breadth-first), and saves them to given folder.
+	:param website: Website to start crawling from.
+	:param save_folder: Folder to save images to.
+	:param max_depth: Maximum number of links between starting page and crawled page.
+	:param allowed_domains: Domains (including their subdomains) which can be crawled, defaults to the domain of the starting page.
+	:param workers: Number of images downloaded at the same time.
+	:param page_workers: Number of pages downloaded at the same time.
+	:param session: HTTP session to use, new one is created (and closed) if not given.
+	:param parser: HTML parser to use (see scripts.extract.HTML_PARSERS).
+	:param events: JobEvents to report progress to.
+	:param scheduler: HostScheduler limiting requests per host, new one is created if not given (share it between jobs to share the limits).
+	:param image_width: Width of window variants of responsive images are chosen for, None to download the largest variant.
+	:param metrics: JobMetrics to record timings, counts and sizes to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:param image_filter: ImageFilter images are probed with before download (embedded images without extension are downloaded too),
+	                     None to download every image with image extension without probing.
+	:return: Dictionary mapping download result (IMG_SAVED, IMG_DUPLICATE, IMG_FAILED or IMG_FILTERED) to number of images with it
+	         (results of single images are reported through events), None if starting page couldn't be downloaded.
+	"""
+
+	if events is None:
+		events = JobEvents()
+	if scheduler is None:
+		scheduler = HostScheduler()
+	if metrics is None:
+		metrics = JobMetrics()
+	if allowed_domains is None:
+		allowed_domains = [urlsplit(website).hostname]
+	allowed_domains = [domain.lower().strip(".") for domain in allowed_domains]
+
+	# create save folder if it doesn't exist
+	if not os.path.isdir(save_folder):
+		os.mkdir(save_folder)
+
+	# resumes interrupted run of the same crawl (fails if the same crawl is running already)
+	journal = JobJournal(save_folder, f"crawl {website}")
+
+	own_session = session is None
+	if own_session:
+		session = create_session(pool_size=workers + page_workers)
+
+	cache = HttpCache(save_folder)
+	index = FolderIndex(save_folder)
+	visited = UrlSet()
+	visited.add(website)
+	events.subscribe(metrics.count_event)
+	try:
+		# only results of finished images are kept, not their futures
+		counts = Counter()
+		counts_lock = threading.Lock()
+		slots = threading.BoundedSemaphore(workers * IMAGES_IN_FLIGHT)
+		errors = []
+
+		def image_done(future):
+			if future.exception() is not None:
+				errors.append(future.exception())
+			else:
+				with counts_lock:
+					counts[future.result()] += 1
+			slots.release()
+
+		with ThreadPoolExecutor(max_workers=page_workers) as page_executor, ThreadPoolExecutor(max_workers=workers) as image_executor:
+			frontier = [website]
+			for depth in range(max_depth + 1):
+				next_frontier = []
+				page_futures = {page_executor.submit(_fetch_links, session, page, cache, scheduler, parser, image_width, metrics, limiter, image_filter is None): page for page in frontier}
+				for page_future in as_completed(page_futures):
+					links = page_future.result()
+					if links is None:
+						if depth == 0:
+							journal.finish()
+							events.emit(EVENT_DONE, url=website)
+							return None
+						continue
+					images, pages = links
+
+					# each image is downloaded only once, even if many pages link to it
+					images = [image for image in images if visited.add(image)]
+					journal.record_many([image for image in images if journal.state(image) is None], STATE_PENDING)
+					for image in images:
+						slots.acquire()
+						image_executor.submit(download_image, session, image, index, cache, scheduler, events, journal, metrics, limiter, image_filter).add_done_callback(image_done)
+
+					if depth < max_depth:
+						for page in pages:
+							if _in_scope(page, allowed_domains) and _is_page(page) and visited.add(page):
+								next_frontier.append(page)
+				frontier = next_frontier
+		if errors:
+			raise errors[0]
+		journal.finish()
+		events.emit(EVENT_DONE, url=website)
+		return dict(counts)
+	except BaseException:
+		journal.close()
+		raise
+	finally:
+		events.unsubscribe(metrics.count_event)
+		index.close()
+		cache.close()
+		if own_session:
+			session.close()
+
+def _fetch_links(session, page, cache, scheduler, parser, image_width, metrics, limiter, require_extension) -> tuple[list[str], list[str]] | None:
+	content = fetch_page(session, page, cache, scheduler, metrics, limiter=limiter, html_only=True, max_size=MAX_PAGE_SIZE)
+	if content is None:
+		return None
+	with metrics.time(STAGE_PARSE):
+		return extract_links(content, page, parser, image_width, require_extension)
+
+def _is_page(url) -> bool:
+	name = urlsplit(url).path.rpartition('/')[2]
+	return '.' not in name or name.rpartition('.')[2].lower() not in SKIPPED_EXT
+
+def _in_scope(url, allowed_domains) -> bool:
+	host = urlsplit(url).hostname
+	if host is None:
+		return False
+	return any(host == domain or host.endswith("." + domain) for domain in allowed_domains)
+
+
+class UrlSet:
+	"""
+	Set of urls which stores only 8 byte hash of every url, so it stays small even for crawls of many pages.
+	Probability of two different urls colliding is negligible (below 10^-7 for a million urls).
+	"""
+
+	def __init__(self):
+		self.hashes = set()
+
+	def add(self, url) -> bool:
+		"""
+		Adds url to set.
+		:param url: Url to add.
+		:return: True if url wasn't in set before.
+		"""
+
+		url_hash = int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+		if url_hash in self.hashes:
+			return False
+		self.hashes.add(url_hash)
+		return True
+
+	def __len__(self):
+		return len(self.hashes)
@@ -0,0 +1,107 @@
+import threading
+from dataclasses import dataclass
+
+
+# kinds of events
+EVENT_PROGRESS = "progress"  # part of a file was downloaded
+EVENT_FILE = "file"  # file was saved (image saved, video muxed)
+EVENT_SKIPPED = "skipped"  # file wasn't saved because it already exists
+EVENT_FAILED = "failed"  # file couldn't be downloaded or processed
+EVENT_DONE = "done"  # whole job finished
+
+
+@dataclass(frozen=True)
+class Event:
+	"""
+	Single event reported by a download job.
+	kind: One of EVENT_* constants.
+	url: Url of the image/video the event is about (page url for EVENT_DONE).
+	path: Path of the file being written (or saved).
+	downloaded_bytes, total_bytes: Progress of the file (total_bytes can be an estimate or None).
+	speed: Download speed in bytes per second, eta: Estimated remaining time in seconds.
+	error: Why the file failed (for EVENT_FAILED, if known) or why it was filtered out (for EVENT_SKIPPED).
+	"""
+
+	kind: str
+	url: str | None = None
+	path: str | None = None
+	downloaded_bytes: int | None = None
+	total_bytes: int | None = None
+	speed: float | None = None
+	eta: float | None = None
+	error: str | None = None
+
+
+class JobEvents:
+	"""
+	Delivers events of a single download job to its subscribers.
+	Events are delivered on the thread which produced them, subscribers have to be thread-safe
+	(GUI should pass them to its own thread).
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.subscribers = []
+
+	def subscribe(self, callback):
+		"""
+		Registers callback which is called with every Event.
+		:param callback: Function taking one argument (Event).
+		"""
+
+		with self.lock:
+			self.subscribers.append(callback)
+
+	def unsubscribe(self, callback):
+		with self.lock:
+			self.subscribers.remove(callback)
+
+	def emit(self, kind, **fields):
+		"""
+		Creates event and delivers it to all subscribers.
+		:param kind: One of EVENT_* constants.
+		:param fields: Other fields of the Event.
+		"""
+
+		with self.lock:
+			subscribers = tuple(self.subscribers)
+		if subscribers:
+			event = Event(kind, **fields)
+			for callback in subscribers:
+				callback(event)
+
+	def progress_hook(self, progress):
+		"""
+		yt-dlp progress hook (for 'progress_hooks' option), translates yt-dlp's progress into events.
+		:param progress: Progress dict from yt-dlp.
+		"""
+
+		info = progress.get("info_dict") or {}
+		match progress.get("status"):
+			case "downloading" | "finished":
+				kind = EVENT_PROGRESS
+			case "error":
+				kind = EVENT_FAILED
+			case _:
+				return
+		self.emit(kind, url=info.get("webpage_url"), path=progress.get("filename"),
+		          downloaded_bytes=progress.get("downloaded_bytes"), total_bytes=progress.get("total_bytes") or progress.get("total_bytes_estimate"),
+		          speed=progress.get("speed"), eta=progress.get("eta"))
+
+
+class QuietLogger:
+	"""
+	Logger for yt-dlp which discards all messages (so yt-dlp doesn't write to stdout/stderr).
+	"""
+
+	def debug(self, msg):
+		pass
+
+	def info(self, msg):
+		pass
+
+	def warning(self, msg):
+		pass
+
+	def error(self, msg):
+		pass
@@ -0,0 +1,284 @@
+import importlib.util
+import re
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+
+IMG_EXT = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp']
+SCAN_PARSER = 'scan'  # single pass scanner built on python's HTMLParser (no tree is built)
+HTML_PARSERS = [SCAN_PARSER, 'lxml', 'html.parser']  # lxml and html.parser build BeautifulSoup tree, they are more forgiving with broken HTML
+HTML_PARSER = SCAN_PARSER  # fastest on big pages (see benchmarks/parse.py)
+LXML_AVAILABLE = importlib.util.find_spec('lxml') is not None  # if it isn't, html.parser (which comes with python) is used instead
+IMAGE_TAGS = ['img', 'a', 'picture', 'source']  # only tags that can reference images (or other pages) are parsed
+IMAGE_WIDTH = None  # width of window images are chosen for (from srcset/picture variants), None to always choose the largest variant
+EM_SIZE = 16  # size of em/rem (in pixels) in sizes attribute
+SRCSET_URL = re.compile(r'[\s,]*(\S+)')
+CSS_LENGTH = re.compile(r'(\d*\.?\d+)(px|vw|em|rem)')
+MEDIA_FEATURE = re.compile(r'\(\s*(min|max)-width\s*:\s*(\d*\.?\d+)(px|em|rem)\s*\)')
+
+
+def is_image_url(url) -> bool:
+	"""
+	Checks whether url points to image (by its extension).
+	:param url: Url to check.
+	:return: True if url has image extension.
+	"""
+
+	return url.split('?')[0].split('.')[-1] in IMG_EXT
+
+def extract_images(page, base_url, parser=HTML_PARSER, image_width=IMAGE_WIDTH, require_extension=True) -> list[str]:
+	"""
+	Finds all images (embedded and linked) in given page.
+	:param page: HTML of the page.
+	:param base_url: Url of the page, used to resolve relative links.
+	:param parser: Parser to use, one of HTML_PARSERS.
+	:param image_width: Width of window images are chosen for (see ImageScanner), None to choose the largest variant of every image.
+	:param require_extension: Skip embedded images without image extension (set to False when images are probed before download).
+	:return: List of absolute image urls, without duplicates, in order of appearance.
+	"""
+
+	return extract_links(page, base_url, parser, image_width, require_extension, collect_pages=False)[0]
+
+def extract_links(page, base_url, parser=HTML_PARSER, image_width=IMAGE_WIDTH, require_extension=True, collect_pages=True) -> tuple[list[str], list[str]]:
+	"""
+	Finds all images (embedded and linked) and links to other pages in given page.
+	:param page: HTML of the page.
+	:param base_url: Url of the page, used to resolve relative links.
+	:param parser: Parser to use, one of HTML_PARSERS.
+	:param image_width: Width of window images are chosen for (see ImageScanner), None to choose the largest variant of every image.
+	:param require_extension: Skip embedded images without image extension (set to False when images are probed before download).
+	:param collect_pages: Collect links to other pages, if False the list of page urls is always empty.
+	:return: Lists of absolute image urls and page urls, without duplicates, in order of appearance.
+	"""
+
+	if parser == 'lxml' and not LXML_AVAILABLE:
+		parser = 'html.parser'
+
+	scanner = ImageScanner(base_url, image_width, require_extension, collect_pages)
+	if parser == SCAN_PARSER:
+		scanner.feed(page)
+		scanner.close()
+	else:
+		from bs4 import BeautifulSoup, SoupStrainer  # imported only when needed (it is slow to import)
+
+		for tag in BeautifulSoup(page, parser, parse_only=SoupStrainer(IMAGE_TAGS)).find_all(IMAGE_TAGS):
+			if tag.name == 'picture':
+				# tree has no end tags, variants of the picture are passed to the scanner together
+				scanner.handle_starttag('picture', tag.attrs.items())
+				for child in tag.find_all(['source', 'img']):
+					scanner.handle_starttag(child.name, child.attrs.items())
+				scanner.handle_endtag('picture')
+			elif tag.name == 'a' or tag.find_parent('picture') is None:
+				scanner.handle_starttag(tag.name, tag.attrs.items())
+		scanner.close()
+	return scanner.images, scanner.pages
+
+def page_url(url, base_url) -> str | None:
+	"""
+	Converts link to absolute page url (without fragment).
+	:param url: Link found in page.
+	:param base_url: Url of the page, used to resolve relative links.
+	:return: Absolute url, None if link doesn't point to web page.
+	"""
+
+	url = urldefrag(urljoin(base_url, url))[0]
+	if urlsplit(url).scheme not in ('http', 'https'):
+		return None
+	return url
+
+def parse_srcset(srcset) -> list[tuple[str, int | None, float]]:
+	"""
+	Parses srcset attribute (of img or source tag).
+	:param srcset: Value of the attribute.
+	:return: List of candidates: url, width (None if candidate has density descriptor) and pixel density (1 if width is given).
+	"""
+
+	candidates = []
+	position = 0
+	while (match := SRCSET_URL.match(srcset, position)) is not None:
+		url = match.group(1)
+		position = match.end()
+		if url.endswith(','):
+			# candidate without descriptor
+			url, descriptor = url.rstrip(','), ''
+		else:
+			end = srcset.find(',', position)
+			if end == -1:
+				end = len(srcset)
+			descriptor = srcset[position:end].strip()
+			position = end + 1
+
+		width, density = None, 1.0
+		try:
+			if descriptor.endswith('w'):
+				width = int(descriptor[:-1])
+			elif descriptor.endswith('x'):
+				density = float(descriptor[:-1])
+		except ValueError:
+			continue  # invalid descriptor, browsers ignore such candidates
+		candidates.append((url, width, density))
+	return candidates
+
+def parse_sizes(sizes, window_width) -> float | None:
+	"""
+	Finds width of image slot from sizes attribute, the same way as browser with window of given width.
+	Only (min-width)/(max-width) media conditions and px, vw, em and rem lengths are supported.
+	:param sizes: Value of the attribute.
+	:param window_width: Width of the window in pixels.
+	:return: Width of the slot in pixels, None if it can't be determined.
+	"""
+
+	for size in sizes.split(','):
+		condition, _, length = size.strip().rpartition(' ')
+		if condition and not media_matches(condition, window_width):
+			continue
+		parsed = CSS_LENGTH.fullmatch(length)
+		if parsed is None:
+			continue
+		value, unit = float(parsed.group(1)), parsed.group(2)
+		match unit:
+			case 'px':
+				return value
+			case 'vw':
+				return value * window_width / 100
+			case _:
+				return value * EM_SIZE
+	return None
+
+def media_matches(condition, window_width) -> bool:
+	"""
+	Checks whether media condition (of sizes attribute or source tag) matches window of given width.
+	:param condition: Media condition, only (min-width)/(max-width) features joined with "and" are supported.
+	:param window_width: Width of the window in pixels.
+	:return: True if the condition matches, False if it doesn't or it isn't supported.
+	"""
+
+	features = [feature.strip() for feature in condition.strip().removeprefix('all and').removeprefix('screen and').split(' and ')]
+	for feature in features:
+		match = MEDIA_FEATURE.fullmatch(feature)
+		if match is None:
+			return False
+		limit = float(match.group(2)) * (1 if match.group(3) == 'px' else EM_SIZE)
+		if (match.group(1) == 'min' and window_width < limit) or (match.group(1) == 'max' and window_width > limit):
+			return False
+	return True
+
+def choose_variant(candidates, slot_width=None) -> str:
+	"""
+	Chooses single variant of an image.
+	:param candidates: Candidates as returned by parse_srcset (all variants of the same image).
+	:param slot_width: Width (in pixels) the image is displayed at, None to choose the largest variant.
+	:return: Url of the chosen variant.
+	"""
+
+	sized = [candidate for candidate in candidates if candidate[1] is not None]
+	if sized:
+		if slot_width is not None:
+			# the smallest variant which is still sharp
+			covering = [candidate for candidate in sized if candidate[1] >= slot_width]
+			if covering:
+				return min(covering, key=lambda candidate: candidate[1])[0]
+		return max(sized, key=lambda candidate: candidate[1])[0]
+
+	if slot_width is not None:
+		covering = [candidate for candidate in candidates if candidate[2] >= 1]
+		if covering:
+			return min(covering, key=lambda candidate: candidate[2])[0]
+	return max(candidates, key=lambda candidate: candidate[2])[0]
+
+class ImageScanner(HTMLParser):
+	"""
+	Finds images and links to other pages in HTML in a single pass, without building the document tree.
+	Variants of the same image (img srcset, sources of picture) are grouped and only one of them is chosen:
+	the largest one, or the one browser with window of image_width would choose.
+	All other variants are treated as already found, so links to them are skipped as well.
+	Links (a tags) are images only if they have image extension, embedded images (img and source tags) can be accepted without it.
+	Other links are collected as pages only if collect_pages is set (they are resolved only when crawling).
+	"""
+
+	def __init__(self, base_url, image_width=IMAGE_WIDTH, require_extension=True, collect_pages=True):
+		super().__init__(convert_charrefs=True)
+		self.base_url = base_url
+		self.image_width = image_width
+		self.require_extension = require_extension
+		self.collect_pages = collect_pages
+		self.images = []
+		self.pages = []
+		self.seen = set()
+		self.picture = None  # candidates of picture tag being parsed
+		self.picture_slot = None
+
+	def handle_starttag(self, tag, attrs):
+		match tag:
+			case 'img' | 'source':
+				self._handle_variants(tag, dict(attrs))
+				return
+			case 'picture':
+				self.picture, self.picture_slot = [], None
+				return
+			case 'a':
+				url = dict(attrs).get('href')
+			case _:
+				return
+
+		if url is None:
+			return
+		if is_image_url(url):
+			self._add_image(urljoin(self.base_url, url))
+		elif self.collect_pages:
+			url = page_url(url, self.base_url)
+			if url is not None and url not in self.seen:
+				self.seen.add(url)
+				self.pages.append(url)
+
+	def handle_endtag(self, tag):
+		if tag == 'picture':
+			self._flush_picture()
+
+	def close(self):
+		super().close()
+		self._flush_picture()
+
+	def _handle_variants(self, tag, attrs):
+		if tag == 'source':
+			if self.picture is None:
+				return  # source of video/audio
+			if self.image_width is not None and attrs.get('media') and not media_matches(attrs['media'], self.image_width):
+				return
+		candidates = parse_srcset(attrs['srcset']) if attrs.get('srcset') else []
+		if tag == 'img' and attrs.get('src'):
+			candidates.insert(0, (attrs['src'], None, 1.0))
+		if self.require_extension:
+			candidates = [candidate for candidate in candidates if is_image_url(candidate[0])]
+		else:
+			# e.g. data: urls can't be downloaded
+			candidates = [candidate for candidate in candidates if urlsplit(urljoin(self.base_url, candidate[0])).scheme in ('http', 'https')]
+
+		slot = None
+		if self.image_width is not None:
+			slot = parse_sizes(attrs['sizes'], self.image_width) if attrs.get('sizes') else None
+
+		if self.picture is not None:
+			self.picture.extend(candidates)
+			if self.picture_slot is None:
+				self.picture_slot = slot
+		elif candidates:
+			self._add_variants(candidates, slot)
+
+	def _flush_picture(self):
+		if self.picture:
+			self._add_variants(self.picture, self.picture_slot)
+		self.picture, self.picture_slot = None, None
+
+	def _add_variants(self, candidates, slot):
+		if slot is None:
+			slot = self.image_width  # browsers display images as wide as the window if sizes isn't given
+		urls = [urljoin(self.base_url, candidate[0]) for candidate in candidates]
+		chosen = urljoin(self.base_url, choose_variant(candidates, slot))
+		self._add_image(chosen)
+		self.seen.update(urls)
+
+	def _add_image(self, url):
+		if url not in self.seen:
+			self.seen.add(url)
+			self.images.append(url)
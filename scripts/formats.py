@@ -0,0 +1,127 @@
+import math
+from dataclasses import dataclass
+
+
+SIZE_TOLERANCE = 0.95  # formats whose sizes differ by less than ~5% are considered equally good
+UNKNOWN_QUALITY = -1_000_000  # quality of formats without known size/bitrate, they are ranked last
+
+
+@dataclass(frozen=True)
+class FormatPolicy:
+	"""
+	Rules for choosing the best video and audio format.
+	max_width, max_height: Resolution cap, bigger formats are used only if no format fits.
+	video_codecs, audio_codecs, containers: Preferred codecs (e.g. "avc1", "mp4a") and extensions, most preferred first.
+	size_budget: Maximum size (in bytes) of single format, bigger formats are used only if no format fits.
+	bitrate_per_pixel: Compare formats of the same resolution by bitrate per pixel instead of file size.
+	"""
+
+	max_width: int | None = None
+	max_height: int | None = None
+	video_codecs: tuple[str, ...] = ()
+	audio_codecs: tuple[str, ...] = ()
+	containers: tuple[str, ...] = ()
+	size_budget: int | None = None
+	bitrate_per_pixel: bool = False
+
+
+DEFAULT_POLICY = FormatPolicy()
+
+
+def select_formats(formats, policy=DEFAULT_POLICY) -> tuple[str | None, str | None]:
+	"""
+	Chooses the best video and audio format in a single pass over available formats.
+	:param formats: List of formats (info["formats"] from yt-dlp, sorted worst to best).
+	:param policy: FormatPolicy to use.
+	:return: Ids of the best video and audio format (audio is the same as video if there are no audio only formats),
+	         (None, None) if there is no usable video format.
+	"""
+
+	best_video, best_video_key = None, None
+	best_audio, best_audio_key = None, None
+
+	for position, fmt in enumerate(formats):
+		if fmt.get("vcodec") != "none":
+			key = _video_key(fmt, position, policy)
+			if key is not None and (best_video_key is None or key > best_video_key):
+				best_video, best_video_key = fmt, key
+		elif fmt.get("acodec") != "none":  # skip formats without audio and video (e.g. storyboards)
+			key = _audio_key(fmt, position, policy)
+			if best_audio_key is None or key > best_audio_key:
+				best_audio, best_audio_key = fmt, key
+
+	if best_video is None:
+		return None, None
+	if best_audio is None:
+		# if there is no audio only format, assume the best video format has audio
+		return best_video["format_id"], best_video["format_id"]
+	return best_video["format_id"], best_audio["format_id"]
+
+def format_size(fmt) -> int | None:
+	"""
+	Returns (approximate) size of the format.
+	:param fmt: Format dict.
+	:return: Size in bytes, None if unknown.
+	"""
+
+	return fmt.get("filesize") or fmt.get("filesize_approx") or None
+
+def _video_key(fmt, position, policy) -> tuple | None:
+	width = fmt.get("width")
+	if not width:
+		return None
+	height = fmt.get("height") or 0
+	size = format_size(fmt)
+
+	fits = ((policy.max_width is None or width <= policy.max_width)
+	        and (policy.max_height is None or height <= policy.max_height)
+	        and (policy.size_budget is None or size is None or size <= policy.size_budget))
+
+	bitrate = UNKNOWN_QUALITY
+	if policy.bitrate_per_pixel and height:
+		quality = _quality_bucket((fmt.get("tbr") or 0) * 1000 / (width * height * (fmt.get("fps") or 1)))
+	else:
+		quality = _quality_bucket(size)
+		if size is None:
+			# sizes and bitrates can't be compared, bitrate only ranks formats without known size (which are ranked after the others)
+			bitrate = _quality_bucket(fmt.get("vbr") or fmt.get("tbr"))
+
+	if not fits:
+		# the smaller the better when nothing fits
+		width, quality, bitrate = -width, _invert(quality), _invert(bitrate)
+	return (fits, width,
+	        _preference(fmt.get("vcodec"), policy.video_codecs),
+	        _preference(fmt.get("ext"), policy.containers),
+	        quality, bitrate, position)
+
+def _audio_key(fmt, position, policy) -> tuple:
+	size = format_size(fmt)
+	fits = policy.size_budget is None or size is None or size <= policy.size_budget
+
+	quality = _quality_bucket(size)
+	bitrate = _quality_bucket(fmt.get("abr") or fmt.get("tbr")) if size is None else UNKNOWN_QUALITY  # see _video_key
+	if not fits:
+		quality = _invert(quality)
+	return (fits,
+	        _preference(fmt.get("acodec"), policy.audio_codecs),
+	        _preference(fmt.get("ext"), policy.containers),
+	        quality, bitrate, position)
+
+def _preference(value, preferred) -> int:
+	# codecs can have profile appended (e.g. "avc1.64001F"), only the name is compared
+	if value is None:
+		return 0
+	value = value.split(".")[0]
+	for rank, preferred_value in enumerate(preferred):
+		if value == preferred_value:
+			return len(preferred) - rank
+	return 0
+
+def _quality_bucket(value) -> int:
+	# values within SIZE_TOLERANCE of each other (mostly) share a bucket, so yt-dlp's own order decides between them
+	if not value or value <= 0:
+		return UNKNOWN_QUALITY
+	return math.floor(math.log(value) / -math.log(SIZE_TOLERANCE))
+
+def _invert(quality) -> int:
+	return quality if quality == UNKNOWN_QUALITY else -quality
@@ -1,82 +1,384 @@
+import codecs
+import hashlib
 import os
-from urllib.parse import urljoin
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from bs4 import BeautifulSoup
 from pathvalidate import sanitize_filename
 import requests
+import urllib3
 
+from scripts.bandwidth import CATEGORY_IMAGE, CATEGORY_PAGE
+from scripts.cache import conditional_headers, HttpCache
+from scripts.events import EVENT_DONE, EVENT_FILE, EVENT_FAILED, EVENT_SKIPPED, JobEvents
+from scripts.extract import extract_images, HTML_PARSER, IMAGE_WIDTH, ImageScanner, is_image_url, SCAN_PARSER
+from scripts.index import FolderIndex, TEMP_PREFIX
+from scripts.journal import JobJournal, resume_path, STATE_DONE, STATE_PARTIAL, STATE_PENDING
+from scripts.metrics import JobMetrics, STAGE_PAGE, STAGE_PARSE, STAGE_TRANSFER, STAGE_WRITE
+from scripts.probe import probe_image, rejection
+from scripts.scheduler import HostScheduler
+from scripts.session import create_session
 
-IMG_EXT = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp']
-REQ_HEAD = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/113.0"}
-HTML_PARSER = 'html.parser'  # default that comes with python
 
+DOWNLOAD_WORKERS = 8  # number of images downloaded at the same time
+CHUNK_SIZE = 64 * 1024  # size of chunks in which images are written to disk
 
-def download_images(website, save_folder) -> bool:
+# result of single image download
+IMG_SAVED = "saved"
+IMG_DUPLICATE = "duplicate"
+IMG_FAILED = "failed"
+IMG_FILTERED = "filtered"  # rejected by ImageFilter before download
+HTML_TYPES = ["text/html", "application/xhtml+xml"]  # content types of pages (for fetch_page's html_only)
+RESULT_EVENTS = {IMG_SAVED: EVENT_FILE, IMG_DUPLICATE: EVENT_SKIPPED, IMG_FAILED: EVENT_FAILED, IMG_FILTERED: EVENT_SKIPPED}
+
+
+def download_images(website, save_folder, workers=DOWNLOAD_WORKERS, session=None, parser=HTML_PARSER, events=None, scheduler=None,
+                    image_width=IMAGE_WIDTH, metrics=None, limiter=None, image_filter=None) -> dict | None:
 	"""
 	Downloads all images from given website and saves them to given folder.
 	:param website: Website to download images from.
 	:param save_folder: Folder to save images to.
-	:return: None
+	:param workers: Number of images downloaded at the same time.
+	:param session: HTTP session to use, new one is created (and closed) if not given.
+	:param parser: HTML parser to use (see scripts.extract.HTML_PARSERS).
+	:param events: JobEvents to report progress to.
+	:param scheduler: HostScheduler limiting requests per host, new one is created if not given (share it between jobs to share the limits).
+	:param image_width: Width of window variants of responsive images are chosen for, None to download the largest variant.
+	:param metrics: JobMetrics to record timings, counts and sizes to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:param image_filter: ImageFilter images are probed with before download (embedded images without extension are downloaded too),
+	                     None to download every image with image extension without probing.
+	:return: Dictionary mapping image url to download result (IMG_SAVED, IMG_DUPLICATE, IMG_FAILED or IMG_FILTERED),
+	         None if website couldn't be downloaded.
 	"""
 
-	# download and parse website
-	response = requests.get(website, headers=REQ_HEAD)
-	if response.status_code != 200:
-		return False
-	parsed_page = BeautifulSoup(response.text, HTML_PARSER)
-
-	# get all images from website (embedded and linked)
-	images = []
-	for img in parsed_page.find_all('img'):
-		try:  # Skip images with empty 'src' attribute
-			if img['src'].split('?')[0].split('.')[-1] in IMG_EXT:
-				images.append(urljoin(website, img['src']))
-		except KeyError:
-			pass
-	for link in parsed_page.find_all('a'):
-		try:  # Skip links with empty 'href' attribute
-			if link['href'].split('?')[0].split('.')[-1] in IMG_EXT:
-				images.append(urljoin(website, link['href']))
-		except KeyError:
-			pass
-	images = list(set(images))  # Remove duplicates
+	if events is None:
+		events = JobEvents()
+	if scheduler is None:
+		scheduler = HostScheduler()
+	if metrics is None:
+		metrics = JobMetrics()
 
 	# create save folder if it doesn't exist
 	if not os.path.isdir(save_folder):
 		os.mkdir(save_folder)
 
-	# download images
-	for image in images:
-		# download image
-		downloaded_image_resp = requests.get(image, headers=REQ_HEAD)
-		if downloaded_image_resp.status_code != 200:
-			continue
-		downloaded_image = downloaded_image_resp.content
-
-		# get image name and path
-		filename = image.split('?')[0].split('/')[-1]
-		filename = filename.strip()
-		filename = sanitize_filename(filename)
-		file_system_path = os.path.join(save_folder, filename)
-		if os.path.isfile(file_system_path):
-			with open(file_system_path, "rb") as opened_file:
-				# skip if image with same name and content already exists
-				if downloaded_image == opened_file.read():
-					continue
-
-			# if image with same name already exists, add number to filename
-			current_file_number = 1
-			while os.path.isfile(file_system_path):
-				current_file_number += 1
-				filename = os.path.splitext(filename)[0] + f" ({current_file_number})" + os.path.splitext(filename)[1]
-				file_system_path = os.path.join(save_folder, filename)
-
-		# save image
-		with open(file_system_path, 'wb') as new_file:
-			new_file.write(downloaded_image)
-
-	return True
+	# resumes interrupted run of the same job (fails if the same job is running already)
+	journal = JobJournal(save_folder, f"images {website}")
+	events.subscribe(metrics.count_event)
+
+	own_session = session is None
+	if own_session:
+		session = create_session(pool_size=workers)
+
+	cache = HttpCache(save_folder)
+	index = FolderIndex(save_folder)
+	try:
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			futures = {}
+
+			def submit(images):
+				journal.record_many([image for image in images if journal.state(image) is None], STATE_PENDING)
+				for image in images:
+					futures[image] = executor.submit(download_image, session, image, index, cache, scheduler, events, journal, metrics, limiter, image_filter)
+
+			if parser == SCAN_PARSER:
+				# page is parsed while it is downloading, images start downloading as soon as they are found
+				scanner = ImageScanner(website, image_width, require_extension=image_filter is None, collect_pages=False)
+
+				def feed(text):
+					with metrics.time(STAGE_PARSE):
+						scanner.feed(text)
+					submit(scanner.images[len(futures):])
+
+				page = fetch_page(session, website, cache, scheduler, metrics, feed, limiter)
+				if page is not None:
+					with metrics.time(STAGE_PARSE):
+						scanner.close()
+					submit(scanner.images[len(futures):])
+			else:
+				page = fetch_page(session, website, cache, scheduler, metrics, limiter=limiter)
+				if page is not None:
+					with metrics.time(STAGE_PARSE):
+						images = extract_images(page, website, parser, image_width, require_extension=image_filter is None)
+					submit(images)
+
+			results = {image: future.result() for image, future in futures.items()}
+		journal.finish()
+		events.emit(EVENT_DONE, url=website)
+	except BaseException:
+		journal.close()
+		raise
+	finally:
+		index.close()
+		events.unsubscribe(metrics.count_event)
+		cache.close()
+		if own_session:
+			session.close()
+
+	# images found before the download of the page failed were downloaded, but the page itself counts as failed
+	return results if page is not None else None
+
+def fetch_page(session, website, cache, scheduler, metrics=None, feed=None, limiter=None, html_only=False, max_size=None) -> str | None:
+	"""
+	Downloads page, cached copy is used if server reports that page hasn't changed.
+	:param session: HTTP session to use.
+	:param website: Url of the page.
+	:param cache: HttpCache of the save folder.
+	:param scheduler: HostScheduler to make the request through.
+	:param metrics: JobMetrics to record timings and sizes to.
+	:param feed: Function called with every decoded part of the page as soon as it is downloaded (e.g. incremental parser),
+	             cached page is passed at once. It isn't called if the page doesn't exist, but it can be called before download fails.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:param html_only: Don't download body of responses whose Content-Type isn't HTML (e.g. linked videos or archives).
+	:param max_size: Maximum size of the page in bytes, bigger pages aren't downloaded (whole), None for no limit.
+	:return: Page content, None if page couldn't be downloaded (or isn't HTML or is too big).
+	"""
+
+	if metrics is None:
+		metrics = JobMetrics()
+
+	cached = cache.get(website)
+	try:
+		with metrics.time(STAGE_PAGE), scheduler.request(session, "GET", website, metrics, headers=conditional_headers(cached), stream=True) as response:
+			if response.status_code == 304 and cached is not None:
+				cache.refresh(website)
+				metrics.count("pages_not_modified")
+				if feed is not None:
+					feed(cached.body)
+				return cached.body
+			if response.status_code != 200:
+				return None
+			content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+			length = response.headers.get("Content-Length", "")
+			if (html_only and content_type and content_type not in HTML_TYPES) or \
+			   (max_size is not None and length.isdigit() and int(length) > max_size):
+				metrics.count("pages_skipped")
+				return None
+
+			# without charset in headers, requests would guess encoding from the whole page, utf-8 is assumed instead
+			decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+			page_hash = hashlib.sha256()
+			parts = []
+			size = 0
+			for chunk in _iter_available(response):
+				if limiter is not None:
+					limiter.consume(CATEGORY_PAGE, len(chunk))
+				page_hash.update(chunk)
+				size += len(chunk)
+				if max_size is not None and size > max_size:
+					metrics.count("pages_skipped")
+					return None
+				parts.append(decoder.decode(chunk))
+				if feed is not None and parts[-1]:
+					feed(parts[-1])
+			parts.append(decoder.decode(b"", final=True))
+			if feed is not None and parts[-1]:
+				feed(parts[-1])
+	except (requests.RequestException, LookupError):  # LookupError: unknown encoding
+		return None
+	metrics.add_bytes("page", size)
+
+	page = "".join(parts)
+	cache.put(website, response, page_hash.hexdigest(), body=page)
+	return page
+
+def download_image(session, image, index, cache, scheduler, events=None, journal=None, metrics=None, limiter=None, image_filter=None) -> str:
+	"""
+	Downloads single image and saves it to folder of given index.
+	:param session: HTTP session to use.
+	:param image: Url of the image.
+	:param index: FolderIndex of the folder to save image to.
+	:param cache: HttpCache of the save folder.
+	:param scheduler: HostScheduler to make the request through.
+	:param events: JobEvents to report result to.
+	:param journal: JobJournal of the job, used to skip finished images and resume partially downloaded ones.
+	:param metrics: JobMetrics to record timings and sizes to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:param image_filter: ImageFilter the image is probed with before download, None to download it without probing.
+	:return: IMG_SAVED, IMG_DUPLICATE, IMG_FAILED or IMG_FILTERED.
+	"""
+
+	if metrics is None:
+		metrics = JobMetrics()
+
+	record = journal.get(image) if journal is not None else None
+	if record is not None and record["state"] == STATE_DONE:
+		# finished before the job was interrupted
+		if events is not None:
+			events.emit(EVENT_SKIPPED, url=image)
+		return record["result"]
+
+	extension = None
+	probe = None
+	if image_filter is not None and (record is None or record["state"] == STATE_PENDING) and cache.get(image) is None:
+		# images which were downloaded before (cached) or started downloading already passed the filter
+		probe = probe_image(session, image, scheduler, metrics, limiter)
+		if probe is not None:  # if probe failed, the download itself decides
+			reason = rejection(probe, image_filter)
+			if reason is not None:
+				if journal is not None:
+					journal.record(image, STATE_DONE, result=IMG_FILTERED)
+				if events is not None:
+					events.emit(EVENT_SKIPPED, url=image, error=reason)
+				return IMG_FILTERED
+			if probe.format is not None and not is_image_url(image):
+				extension = probe.format
+
+	status, path, size = _save_image(session, image, index, cache, scheduler, journal, record, metrics, limiter, extension,
+	                                 *((probe.body, probe.response) if probe is not None else ()))
+	if journal is not None and status != IMG_FAILED:
+		journal.record(image, STATE_DONE, result=status)
+	if events is not None:
+		events.emit(RESULT_EVENTS[status], url=image, path=path, downloaded_bytes=size, total_bytes=size)
+	return status
+
+def _save_image(session, image, index, cache, scheduler, journal, record, metrics, limiter, extension, body=None, body_response=None) -> tuple[str, str | None, int | None]:
+	"""
+	Downloads single image and saves it to folder of given index.
+	Extension (if given) is added to the filename, for urls without image extension.
+	Body (if given) is the whole image already downloaded by probe_image (with body_response), it is saved without another request.
+	:return: Result (IMG_SAVED, IMG_DUPLICATE or IMG_FAILED), path of saved file and its size (None if image wasn't saved).
+	"""
+
+	# get image name and path
+	filename = image.split('?')[0].split('/')[-1]
+	filename = filename.strip()
+	filename = sanitize_filename(filename)
+	if extension is not None:
+		filename = f"{filename or 'image'}.{extension}"
+	temp_path = resume_path(index.save_folder, image, TEMP_PREFIX, journal.tag if journal is not None else uuid.uuid4().hex[:16])
+
+	if body is not None:
+		try:
+			with metrics.time(STAGE_WRITE), open(temp_path, "wb") as temp_file:
+				temp_file.write(body)
+		except OSError:
+			if os.path.isfile(temp_path):
+				os.remove(temp_path)
+			return IMG_FAILED, None, None
+		image_hash, size = hashlib.sha256(body).hexdigest(), len(body)
+		cache.put(image, body_response, image_hash)
+		return _store_image(index, temp_path, filename, image_hash, size, metrics)
+
+	resume_from = 0
+	if record is not None and record["state"] == STATE_PARTIAL and record.get("validator") is not None and os.path.isfile(temp_path):
+		# continue interrupted download (only if the image hasn't changed since)
+		resume_from = os.path.getsize(temp_path)
+		headers = {"Range": f"bytes={resume_from}-", "If-Range": record["validator"], "Accept-Encoding": "identity"}
+	else:
+		# make conditional request only if cached image is still in the folder
+		cached = cache.get(image)
+		if cached is not None and index.find(cached.content_hash) is None:
+			cached = None
+		headers = conditional_headers(cached)
+
+	# download image into temporary file, hashing it on the way
+	try:
+		with scheduler.request(session, "GET", image, metrics, headers=headers, stream=True) as response:
+			if response.status_code == 304 and "If-Range" not in headers:
+				cache.refresh(image)
+				return IMG_DUPLICATE, None, None
+			if response.status_code == 200:
+				resume_from = 0
+			elif response.status_code != 206 or resume_from == 0:
+				return IMG_FAILED, None, None
+
+			if journal is not None and resume_from == 0:
+				journal.record(image, STATE_PARTIAL, temps=[temp_path], validator=_resume_validator(response))
+			image_hash, size = _stream_to_temp(response, temp_path, resume_from, metrics, limiter)
+	except (requests.RequestException, OSError):
+		if journal is None and os.path.isfile(temp_path):
+			os.remove(temp_path)
+		return IMG_FAILED, None, None
+	cache.put(image, response, image_hash)
+	return _store_image(index, temp_path, filename, image_hash, size, metrics)
+
+def _store_image(index, temp_path, filename, image_hash, size, metrics) -> tuple[str, str | None, int | None]:
+	# moves downloaded image to its final name, unless the same image is in the folder already
+	try:
+		with metrics.time(STAGE_WRITE):
+			saved_name = index.store(temp_path, filename, image_hash)
+	except OSError:
+		if os.path.isfile(temp_path):
+			os.remove(temp_path)
+		return IMG_FAILED, None, None
+	if saved_name is None:
+		return IMG_DUPLICATE, None, None
+
+	return IMG_SAVED, os.path.join(index.save_folder, saved_name), size
+
+def _stream_to_temp(response, temp_path, resume_from=0, metrics=None, limiter=None) -> tuple[str, int]:
+	"""
+	Streams response body into temporary file (in save folder, so it can be renamed atomically).
+	:param response: Streamed response.
+	:param temp_path: Path of temporary file.
+	:param resume_from: Size of already downloaded part of the file (response contains the rest), 0 to start from scratch.
+	:param metrics: JobMetrics to record transfer and write time and downloaded bytes to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:return: Hex digest of file content and its size.
+	"""
+
+	if metrics is None:
+		metrics = JobMetrics()
+	start = time.perf_counter()
+	write_time = 0.0
+
+	if resume_from:
+		with open(temp_path, "rb") as temp_file:
+			file_hash = hashlib.file_digest(temp_file, "sha256")
+	else:
+		file_hash = hashlib.sha256()
+	size = resume_from
+
+	with open(temp_path, "ab" if resume_from else "wb") as temp_file:
+		for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+			if limiter is not None:
+				limiter.consume(CATEGORY_IMAGE, len(chunk))
+			write_start = time.perf_counter()
+			file_hash.update(chunk)
+			temp_file.write(chunk)
+			write_time += time.perf_counter() - write_start
+			size += len(chunk)
+
+	metrics.add_duration(STAGE_TRANSFER, time.perf_counter() - start - write_time)
+	metrics.add_duration(STAGE_WRITE, write_time)
+	metrics.add_bytes("image", size - resume_from)
+	return file_hash.hexdigest(), size
+
+def _iter_available(response):
+	"""
+	Iterates over streamed response body in parts, every part is returned as soon as it arrives
+	(iter_content waits until the whole chunk is downloaded, which stalls incremental parsing of slow pages).
+	:param response: Streamed response.
+	:return: Generator of decoded (decompressed) parts of the body.
+	:raises requests.ConnectionError: If the connection broke.
+	"""
+
+	read1 = getattr(response.raw, "read1", None)
+	if read1 is None:  # urllib3 1.x
+		yield from response.iter_content(chunk_size=CHUNK_SIZE)
+		return
+	try:
+		while chunk := read1(CHUNK_SIZE, decode_content=True):
+			yield chunk
+	except urllib3.exceptions.HTTPError as error:
+		raise requests.ConnectionError(error) from error
+
+def _resume_validator(response) -> str | None:
+	"""
+	Finds validator which can be used to resume download of response with Range request.
+	:param response: Response (with status 200).
+	:return: Strong ETag or Last-Modified, None if download can't be resumed.
+	"""
 
+	if response.headers.get("Accept-Ranges") != "bytes" or response.headers.get("Content-Encoding", "identity") != "identity":
+		return None
+	etag = response.headers.get("ETag")
+	if etag is not None and not etag.startswith("W/"):
+		return etag
+	return response.headers.get("Last-Modified")
 
 if __name__ == '__main__':
 	download_images('https://www.google.com/', 'images')
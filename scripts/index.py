@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from scripts.extract import IMG_EXT
+
+
+SIDECAR_FOLDER = ".media_scraper"  # hidden folder (inside save folder) with Media Scraper's own data
+INDEX_FILE = "index.db"
+TEMP_PREFIX = ".media_scraper_"  # prefix of temporary files created while downloading
+INDEXED_EXT = {*IMG_EXT, 'avif'}  # only images are hashed (videos in the same folder are big and may still be downloading), avif is found by probing
+
+
+def sidecar_path(save_folder, filename) -> str:
+	"""
+	Returns path of Media Scraper's data file for given save folder (creates sidecar folder if needed).
+	:param save_folder: Folder media is saved to.
+	:param filename: Name of the data file.
+	:return: Path of the data file.
+	"""
+
+	folder = os.path.join(save_folder, SIDECAR_FOLDER)
+	os.makedirs(folder, exist_ok=True)
+	return os.path.join(folder, filename)
+
+def file_hash(path) -> str:
+	"""
+	Calculates hash of file without loading it into memory at once.
+	:param path: Path of the file.
+	:return: Hex digest of file content.
+	"""
+
+	with open(path, "rb") as opened_file:
+		return hashlib.file_digest(opened_file, "sha256").hexdigest()
+
+
+class FolderIndex:
+	"""
+	Index of files in save folder, maps content hashes to filenames and allocates new filenames.
+	Index is stored in SQLite database inside sidecar folder, so it is built only once and shared
+	between threads and processes saving to the same folder.
+	"""
+
+	def __init__(self, save_folder):
+		self.save_folder = save_folder
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(sidecar_path(save_folder, INDEX_FILE), timeout=60, check_same_thread=False, isolation_level=None)
+		self.connection.executescript("""
+			CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, hash TEXT, size INTEGER, mtime_ns INTEGER);
+			CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+			CREATE INDEX IF NOT EXISTS files_name_nocase ON files (name COLLATE NOCASE);
+			CREATE TABLE IF NOT EXISTS names (base TEXT PRIMARY KEY COLLATE NOCASE, counter INTEGER);
+		""")
+		self.update()
+
+	def update(self):
+		"""
+		Synchronizes index with files in save folder, only new and modified images are hashed.
+		"""
+
+		with self.lock:
+			known = {name: (size, mtime_ns) for name, size, mtime_ns in self.connection.execute("SELECT name, size, mtime_ns FROM files")}
+
+			changed = []
+			present = set()
+			with os.scandir(self.save_folder) as entries:
+				for entry in entries:
+					if not entry.is_file() or entry.name.startswith(TEMP_PREFIX):
+						continue
+					present.add(entry.name)
+					if os.path.splitext(entry.name)[1][1:].lower() not in INDEXED_EXT:
+						continue
+					stat = entry.stat()
+					if known.get(entry.name) != (stat.st_size, stat.st_mtime_ns):
+						changed.append((entry.name, file_hash(entry.path), stat.st_size, stat.st_mtime_ns))
+
+			self.connection.execute("BEGIN IMMEDIATE")
+			try:
+				self.connection.executemany("DELETE FROM files WHERE name = ?", ((name,) for name in known.keys() - present))
+				self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", changed)
+				self.connection.execute("COMMIT")
+			except BaseException:
+				self.connection.execute("ROLLBACK")
+				raise
+
+	def find(self, content_hash) -> str | None:
+		"""
+		Finds file with given content.
+		:param content_hash: Hex digest of file content.
+		:return: Name of the file, None if there is no such file.
+		"""
+
+		with self.lock:
+			row = self.connection.execute("SELECT name FROM files WHERE hash = ? LIMIT 1", (content_hash,)).fetchone()
+		return None if row is None else row[0]
+
+	def store(self, temp_path, filename, content_hash) -> str | None:
+		"""
+		Moves downloaded file into save folder under free name, unless file with the same content already exists.
+		:param temp_path: Path of downloaded (temporary) file, it is removed if file is a duplicate.
+		:param filename: Preferred name of the file.
+		:param content_hash: Hex digest of file content.
+		:return: Name under which file was saved, None if it is a duplicate.
+		"""
+
+		with self.lock:
+			self.connection.execute("BEGIN IMMEDIATE")
+			try:
+				duplicate = self.connection.execute("SELECT 1 FROM files WHERE hash = ? LIMIT 1", (content_hash,)).fetchone() is not None
+				if not duplicate:
+					name = self._allocate_name(filename)
+					file_system_path = os.path.join(self.save_folder, name)
+					os.replace(temp_path, file_system_path)
+					stat = os.stat(file_system_path)
+					self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (name, content_hash, stat.st_size, stat.st_mtime_ns))
+				self.connection.execute("COMMIT")
+			except BaseException:
+				if self.connection.in_transaction:
+					self.connection.execute("ROLLBACK")
+				raise
+
+		if duplicate:
+			try:
+				os.remove(temp_path)
+			except FileNotFoundError:
+				pass
+			return None
+		return name
+
+	def close(self):
+		self.connection.close()
+
+	def _allocate_name(self, filename) -> str:
+		"""
+		Finds free filename, numbered names ("name (2).ext", "name (3).ext", ...) are derived from the original name.
+		Must be called inside transaction.
+		:param filename: Preferred name of the file.
+		:return: Free filename.
+		"""
+
+		name = filename
+		counter = None
+		while self._name_taken(name):
+			if counter is None:
+				row = self.connection.execute("SELECT counter FROM names WHERE base = ?", (filename,)).fetchone()
+				counter = 1 if row is None else row[0]
+			counter += 1
+			name = os.path.splitext(filename)[0] + f" ({counter})" + os.path.splitext(filename)[1]
+
+		if counter is not None:
+			self.connection.execute("INSERT OR REPLACE INTO names VALUES (?, ?)", (filename, counter))
+		return name
+
+	def _name_taken(self, name) -> bool:
+		if self.connection.execute("SELECT 1 FROM files WHERE name = ? COLLATE NOCASE LIMIT 1", (name,)).fetchone() is not None:
+			return True
+		# file could have been created by someone else since the index was built
+		if os.path.lexists(os.path.join(self.save_folder, name)):
+			self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, NULL, NULL, NULL)", (name,))
+			return True
+		return False
@@ -0,0 +1,215 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from scripts.events import EVENT_FAILED, EVENT_FILE, EVENT_PROGRESS, EVENT_SKIPPED, JobEvents
+
+
+JOB_WORKERS = 3  # number of urls processed at the same time
+SPEED_WINDOW = 3  # seconds, speed of a job is averaged over this time
+
+# states of a job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"  # page couldn't be downloaded or the job crashed
+
+
+@dataclass(frozen=True)
+class JobStatus:
+	"""
+	Snapshot of the progress of a single job.
+	job_id: Number of the job (in order of submission), url: Url being downloaded from.
+	state: One of JOB_* constants.
+	downloaded_bytes: Bytes downloaded so far, speed: Download speed in bytes per second.
+	files, skipped, failed: Number of files saved, skipped (already downloaded) and failed.
+	error: Why the job failed (for JOB_FAILED).
+	"""
+
+	job_id: int
+	url: str
+	state: str
+	downloaded_bytes: int = 0
+	speed: float = 0.0
+	files: int = 0
+	skipped: int = 0
+	failed: int = 0
+	error: str | None = None
+
+
+class _Job:
+	"""
+	Progress of a single job, built from its events (which come from many threads).
+	"""
+
+	def __init__(self, job_id, url, folder, images, videos, ffmpeg_path):
+		self.job_id = job_id
+		self.url = url
+		self.folder = folder
+		self.images = images
+		self.videos = videos
+		self.ffmpeg_path = ffmpeg_path
+
+		self.lock = threading.Lock()
+		self.state = JOB_QUEUED
+		self.error = None
+		self.file_bytes = {}  # path (url if there is none): bytes downloaded
+		self.downloaded_bytes = 0
+		self.counts = {EVENT_FILE: 0, EVENT_SKIPPED: 0, EVENT_FAILED: 0}
+		self.samples = deque()  # (time, downloaded bytes) within the last SPEED_WINDOW seconds
+		self.pending = False  # update was queued and the GUI hasn't read it yet
+
+	def handle_event(self, event) -> None:
+		with self.lock:
+			if event.downloaded_bytes is not None:
+				key = event.path or event.url
+				self.downloaded_bytes += event.downloaded_bytes - self.file_bytes.get(key, 0)
+				self.file_bytes[key] = event.downloaded_bytes
+				now = time.monotonic()
+				self.samples.append((now, self.downloaded_bytes))
+				while now - self.samples[0][0] > SPEED_WINDOW:
+					self.samples.popleft()
+			if event.kind != EVENT_PROGRESS and event.kind in self.counts:
+				self.counts[event.kind] += 1
+
+	def status(self) -> JobStatus:
+		with self.lock:
+			speed = 0.0
+			if self.state == JOB_RUNNING and len(self.samples) > 1:
+				(start, start_bytes), (end, end_bytes) = self.samples[0], self.samples[-1]
+				# the window reaches up to now, so speed drops to zero when nothing is being downloaded
+				elapsed = max(time.monotonic(), end) - start
+				if elapsed > 0:
+					speed = (end_bytes - start_bytes) / elapsed
+			return JobStatus(self.job_id, self.url, self.state, self.downloaded_bytes, speed,
+			                 self.counts[EVENT_FILE], self.counts[EVENT_SKIPPED], self.counts[EVENT_FAILED], self.error)
+
+
+class JobQueue:
+	"""
+	Runs download jobs (images and/or videos of a single url) several at a time, sharing HTTP session and host limits.
+	Every change of a job's progress puts its id to the updates queue and calls notify (from worker thread),
+	the id isn't queued again until the GUI reads the job's status, so a busy job can't flood the GUI.
+	"""
+
+	def __init__(self, workers=JOB_WORKERS, notify=None, limiter=None):
+		"""
+		:param workers: Number of jobs running at the same time.
+		:param notify: Function without arguments called (from worker thread) after job id was put to the updates queue,
+		               e.g. to wake up the GUI thread.
+		:param limiter: BandwidthLimiter shared by all jobs, None for no limit.
+		"""
+
+		self.workers = workers
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+		self.notify = notify
+		self.limiter = limiter
+		self.updates = queue.Queue()
+		self.lock = threading.Lock()
+		self.jobs = {}
+		self.session = None
+		self.scheduler = None
+
+	def submit(self, url, folder, images=True, videos=True, ffmpeg_path="") -> int:
+		"""
+		Queues new job.
+		:param url: Url to download from.
+		:param folder: Folder to save media to (has to exist).
+		:param images: Whether to download images.
+		:param videos: Whether to download videos.
+		:param ffmpeg_path: Path of ffmpeg executable (for videos).
+		:return: Id of the job.
+		"""
+
+		with self.lock:
+			job = _Job(len(self.jobs), url, folder, images, videos, ffmpeg_path)
+			self.jobs[job.job_id] = job
+		self.executor.submit(self._run, job)
+		self._changed(job)
+		return job.job_id
+
+	def status(self, job_id) -> JobStatus:
+		"""
+		Returns current progress of a job, the job is queued to updates again on its next change.
+		:param job_id: Id returned by submit.
+		:return: Snapshot of the job's progress.
+		"""
+
+		job = self.jobs[job_id]
+		with job.lock:
+			job.pending = False
+		return job.status()
+
+	def active(self) -> bool:
+		"""
+		Checks whether any job is queued or running.
+		"""
+
+		with self.lock:
+			jobs = list(self.jobs.values())
+		return any(job.state in (JOB_QUEUED, JOB_RUNNING) for job in jobs)
+
+	def shutdown(self, wait=True):
+		"""
+		Stops accepting jobs, queued jobs which haven't started are cancelled.
+		:param wait: Whether to wait for running jobs to finish.
+		"""
+
+		self.executor.shutdown(wait=wait, cancel_futures=True)
+		if wait and self.session is not None:
+			self.session.close()
+
+	def _changed(self, job):
+		with job.lock:
+			if job.pending:
+				return
+			job.pending = True
+		self.updates.put(job.job_id)
+		if self.notify is not None:
+			self.notify()
+
+	def _run(self, job):
+		events = JobEvents()
+
+		def on_event(event):
+			job.handle_event(event)
+			self._changed(job)
+
+		events.subscribe(on_event)
+		with job.lock:
+			job.state = JOB_RUNNING
+		self._changed(job)
+
+		state, error = JOB_FINISHED, None
+		try:
+			# scripts (and their dependencies like yt-dlp) are imported only when needed, so the window appears sooner
+			from scripts.image import download_images, DOWNLOAD_WORKERS
+			from scripts.scheduler import HostScheduler
+			from scripts.session import create_session
+
+			with self.lock:
+				if self.session is None:
+					self.session = create_session(pool_size=self.workers * DOWNLOAD_WORKERS)
+					self.scheduler = HostScheduler()
+
+			errors = []
+			if job.images and download_images(job.url, job.folder, session=self.session, events=events, scheduler=self.scheduler,
+			                                  limiter=self.limiter) is None:
+				errors.append("page couldn't be downloaded")
+			if job.videos:
+				from scripts.video import download_videos
+				if download_videos(job.url, job.folder, job.ffmpeg_path, events=events, limiter=self.limiter) is None:
+					errors.append("videos couldn't be extracted")
+			if errors and len(errors) == job.images + job.videos:
+				# nothing could be downloaded at all
+				state, error = JOB_FAILED, ", ".join(errors)
+		except Exception as exception:  # one broken url shouldn't stop the other jobs
+			state, error = JOB_FAILED, f"{type(exception).__name__}: {exception}"
+		finally:
+			events.unsubscribe(on_event)
+			with job.lock:
+				job.state, job.error = state, error
+			self._changed(job)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+
+from scripts.index import sidecar_path
+
+
+LOCK_FILE = "jobs.lock"  # running jobs lock one byte of this file (at offset derived from the job), so the same job can't run twice at once
+LOCK_RANGE = 2 ** 30  # number of bytes job locks are spread over
+# states of journal items
+STATE_PENDING = "pending"  # found, but not downloaded yet
+STATE_PARTIAL = "partial"  # download started, temporary file may contain part of the data
+STATE_MUXED = "muxed"  # video and audio merged into the final file, temporary files may still exist
+STATE_DONE = "done"  # finished
+
+_running_lock = threading.Lock()
+_running_jobs = set()  # journal paths of jobs running in this process
+_lock_files = {}  # path: lock file kept open for the whole process (closing any descriptor of it would release all POSIX locks of the process)
+
+
+class JobBusyError(Exception):
+	"""
+	Raised when the same job (the same url saved to the same folder) is already running, in this or another process.
+	"""
+
+
+class JobJournal:
+	"""
+	Crash-safe record of the state of every item (image or video) of a download job.
+	Journal is append-only JSON lines file inside sidecar folder of the save folder, every record is flushed to disk
+	before the work it describes continues, so interrupted job can be resumed from where it stopped.
+	Journal is removed once the whole job finishes.
+	Job owns its journal (and temporary files named after its tag) while it runs, the same job can't be started again until it ends.
+	"""
+
+	def __init__(self, save_folder, job):
+		"""
+		Opens journal of given job (replaying records left by an interrupted run).
+		:param save_folder: Folder the job saves to.
+		:param job: Identifier of the job (e.g. job type and url), same job always uses the same journal.
+		:raises JobBusyError: If the same job is already running.
+		"""
+
+		self.lock = threading.Lock()
+		self.tag = hashlib.sha1(job.encode('utf-8')).hexdigest()[:16]  # part of names of the job's files, same for every run of the job
+		self.path = sidecar_path(save_folder, f"journal_{self.tag}.jsonl")
+		self.items = {}
+		self.lock_path = sidecar_path(save_folder, LOCK_FILE)
+		self.lock_offset = int(self.tag, 16) % LOCK_RANGE
+		self.owned = False
+		self._acquire(job)
+
+		try:
+			if os.path.isfile(self.path):
+				with open(self.path, encoding="utf-8") as journal_file:
+					for line in journal_file:
+						try:
+							record = json.loads(line)
+						except json.JSONDecodeError:  # last line can be incomplete if the crash happened while writing it
+							continue
+						self.items[record["item"]] = record
+
+			# compact the journal, only the latest record of each item is needed
+			temp_path = self.path + ".tmp"
+			with open(temp_path, "w", encoding="utf-8") as journal_file:
+				for record in self.items.values():
+					journal_file.write(json.dumps(record) + "\n")
+				journal_file.flush()
+				os.fsync(journal_file.fileno())
+			os.replace(temp_path, self.path)
+
+			self.file = open(self.path, "a", encoding="utf-8")
+		except BaseException:
+			self._release()
+			raise
+
+	def state(self, item) -> str | None:
+		"""
+		Returns state of given item.
+		:param item: Item identifier (url).
+		:return: One of STATE_* constants, None if item isn't in journal.
+		"""
+
+		record = self.get(item)
+		return None if record is None else record["state"]
+
+	def get(self, item) -> dict | None:
+		"""
+		Returns latest record of given item.
+		:param item: Item identifier (url).
+		:return: Record (with "item", "state" and any additional data), None if item isn't in journal.
+		"""
+
+		with self.lock:
+			return self.items.get(item)
+
+	def record(self, item, state, **data):
+		"""
+		Records new state of given item and flushes it to disk.
+		:param item: Item identifier (url).
+		:param state: One of STATE_* constants.
+		:param data: Additional JSON serializable data to store with the state
+		             ("temps" is list of temporary files which are removed if the job finishes while item isn't done).
+		"""
+
+		self.record_many([item], state, **data)
+
+	def record_many(self, items, state, **data):
+		"""
+		Records the same state of many items (with single flush to disk).
+		:param items: Item identifiers (urls).
+		:param state: One of STATE_* constants.
+		:param data: Additional JSON serializable data to store with the state.
+		"""
+
+		if not items:
+			return
+
+		with self.lock:
+			for item in items:
+				record = {"item": item, "state": state, **data}
+				self.items[item] = record
+				self.file.write(json.dumps(record) + "\n")
+			self.file.flush()
+			os.fsync(self.file.fileno())
+
+	def close(self):
+		"""
+		Closes journal (job can be resumed later).
+		"""
+
+		self.file.close()
+		self._release()
+
+	def finish(self):
+		"""
+		Closes and removes journal of finished job (together with temporary files of items which failed).
+		"""
+
+		self.file.close()
+		try:
+			for record in self.items.values():
+				if record["state"] != STATE_DONE:
+					for temp_path in record.get("temps", ()):
+						if os.path.isfile(temp_path):
+							os.remove(temp_path)
+			os.remove(self.path)
+		finally:
+			self._release()
+
+	def _acquire(self, job):
+		with _running_lock:
+			if self.path in _running_jobs:
+				raise JobBusyError(f"job is already running: {job}")
+			lock_file = _lock_files.get(self.lock_path)
+			if lock_file is None:
+				lock_file = _lock_files[self.lock_path] = open(self.lock_path, "a+b")
+			if not _lock_byte(lock_file, self.lock_offset, True):
+				raise JobBusyError(f"job is already running in another process: {job}")
+			_running_jobs.add(self.path)
+			self.owned = True
+
+	def _release(self):
+		with _running_lock:
+			if not self.owned:
+				return
+			self.owned = False
+			_running_jobs.discard(self.path)
+			_lock_byte(_lock_files[self.lock_path], self.lock_offset, False)
+
+
+def resume_path(save_folder, url, prefix, owner) -> str:
+	"""
+	Returns path of temporary file used for downloading given url, it is always the same for the same job so download can be resumed.
+	:param save_folder: Folder in which temporary file is created.
+	:param url: Url being downloaded.
+	:param prefix: Prefix of the temporary file name.
+	:param owner: Tag of the job downloading the url (JobJournal.tag), jobs downloading the same url don't share temporary file.
+	:return: Path of temporary file.
+	"""
+
+	return os.path.join(save_folder, f"{prefix}{owner}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.part")
+
+def _lock_byte(lock_file, offset, lock) -> bool:
+	# locks (or unlocks) single byte of the file without waiting, locks are released by the OS if the process dies
+	try:
+		if os.name == "nt":
+			import msvcrt
+			lock_file.seek(offset)
+			msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK if lock else msvcrt.LK_UNLCK, 1)
+		else:
+			import fcntl
+			fcntl.lockf(lock_file, (fcntl.LOCK_EX | fcntl.LOCK_NB) if lock else fcntl.LOCK_UN, 1, offset)
+	except OSError:
+		return False
+	return True
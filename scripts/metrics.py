@@ -0,0 +1,233 @@
+import bisect
+import contextlib
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from scripts.events import EVENT_PROGRESS
+
+
+# stages of a job
+STAGE_PAGE = "page"  # downloading the page (including parsing, when the page is parsed while it is downloading)
+STAGE_PARSE = "parse"  # finding images in the page
+STAGE_EXTRACT = "extract"  # yt-dlp extraction of playlist and its entries
+STAGE_TRANSFER = "transfer"  # downloading images/videos (without writing to disk)
+STAGE_WRITE = "write"  # writing downloaded data to disk and storing the files
+STAGE_STREAM = "stream"  # ffmpeg downloading and muxing formats at once
+STAGE_FFMPEG = "ffmpeg"  # remuxing/merging downloaded files
+
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]  # upper bounds of latency histogram buckets in seconds
+PROMETHEUS_PREFIX = "media_scraper"
+
+# profiling modes
+PROFILE_CPU = "cpu"  # cProfile of every thread, saved as pstats file
+PROFILE_MEMORY = "memory"  # tracemalloc snapshot, saved as text file with the biggest allocations
+PROFILE_MODES = [PROFILE_CPU, PROFILE_MEMORY]
+PROFILE_TOP = 50  # number of allocation sites written in memory profile
+
+
+class JobMetrics:
+	"""
+	Counters, stage durations, byte totals and per-host request latency histograms of a download job.
+	Thread-safe, single instance is shared by all threads of the job.
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.counters = Counter()
+		self.bytes = Counter()
+		self.durations = Counter()
+		self.calls = Counter()
+		self.latencies = {}  # host: [count per bucket (last one is +Inf), sum]
+
+	def count(self, name, value=1):
+		"""
+		Increases counter.
+		:param name: Name of the counter (e.g. "retries").
+		:param value: Amount to add.
+		"""
+
+		with self.lock:
+			self.counters[name] += value
+
+	def count_event(self, event):
+		"""
+		Counts event by its kind (can be subscribed to JobEvents), progress events aren't counted.
+		:param event: Event of the job.
+		"""
+
+		if event.kind != EVENT_PROGRESS:
+			self.count(event.kind)
+
+	def add_bytes(self, kind, value):
+		"""
+		Adds to byte total.
+		:param kind: What the bytes are (e.g. "image", "video").
+		:param value: Number of bytes.
+		"""
+
+		with self.lock:
+			self.bytes[kind] += value
+
+	def add_duration(self, stage, seconds):
+		"""
+		Adds time spent in a stage.
+		:param stage: One of STAGE_* constants.
+		:param seconds: Duration in seconds.
+		"""
+
+		with self.lock:
+			self.durations[stage] += seconds
+			self.calls[stage] += 1
+
+	@contextlib.contextmanager
+	def time(self, stage):
+		"""
+		Context manager measuring time spent in it as given stage.
+		:param stage: One of STAGE_* constants.
+		"""
+
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add_duration(stage, time.perf_counter() - start)
+
+	def observe_latency(self, host, seconds):
+		"""
+		Records latency of single request (time until response headers arrived).
+		:param host: Host (and port) the request was sent to.
+		:param seconds: Latency in seconds.
+		"""
+
+		with self.lock:
+			histogram = self.latencies.get(host)
+			if histogram is None:
+				histogram = self.latencies[host] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+			histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+			histogram[1] += seconds
+
+	def merge(self, other):
+		"""
+		Adds all metrics of other job to this one (e.g. to get totals of a batch).
+		:param other: JobMetrics to add.
+		"""
+
+		summary = other.summary()
+		with self.lock:
+			self.counters.update(summary["counters"])
+			self.bytes.update(summary["bytes"])
+			for stage, values in summary["stages"].items():
+				self.durations[stage] += values["seconds"]
+				self.calls[stage] += values["calls"]
+			for host, values in summary["latency"].items():
+				histogram = self.latencies.setdefault(host, [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+				for bucket, count in enumerate(values["buckets"].values()):
+					histogram[0][bucket] += count
+				histogram[1] += values["sum"]
+
+	def summary(self) -> dict:
+		"""
+		Returns JSON serializable summary of all metrics.
+		:return: Counters, byte totals, stages (total seconds and number of calls) and latency histograms per host
+		         (count of requests per bucket, keyed by bucket's upper bound).
+		"""
+
+		with self.lock:
+			return {
+				"counters": dict(self.counters),
+				"bytes": dict(self.bytes),
+				"stages": {stage: {"seconds": round(seconds, 6), "calls": self.calls[stage]} for stage, seconds in self.durations.items()},
+				"latency": {host: {"buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], buckets)), "sum": round(total, 6), "count": sum(buckets)}
+				            for host, (buckets, total) in self.latencies.items()},
+			}
+
+	def prometheus(self) -> str:
+		"""
+		Returns all metrics in Prometheus text exposition format.
+		:return: Text of the metrics.
+		"""
+
+		summary = self.summary()
+		lines = []
+
+		def family(name, kind, description, samples):
+			lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {description}")
+			lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {kind}")
+			for suffix, labels, value in samples:
+				label_text = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+				lines.append(f"{PROMETHEUS_PREFIX}_{name}{suffix}{{{label_text}}} {value}")
+
+		family("events_total", "counter", "Number of events (files saved, skipped and failed, retried requests, ...).",
+		       [("", {"name": name}, value) for name, value in summary["counters"].items()])
+		family("bytes_total", "counter", "Number of bytes downloaded.",
+		       [("", {"kind": kind}, value) for kind, value in summary["bytes"].items()])
+		family("stage_seconds_total", "counter", "Time spent in stage (summed over threads).",
+		       [("", {"stage": stage}, values["seconds"]) for stage, values in summary["stages"].items()])
+		family("stage_calls_total", "counter", "Number of times stage ran.",
+		       [("", {"stage": stage}, values["calls"]) for stage, values in summary["stages"].items()])
+
+		samples = []
+		for host, values in summary["latency"].items():
+			cumulative = 0
+			for bound, count in values["buckets"].items():
+				cumulative += count
+				samples.append(("_bucket", {"host": host, "le": bound}, cumulative))
+			samples.append(("_sum", {"host": host}, values["sum"]))
+			samples.append(("_count", {"host": host}, values["count"]))
+		family("request_latency_seconds", "histogram", "Time until response headers arrived.", samples)
+
+		return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profile(mode, path):
+	"""
+	Context manager profiling code run in it (including threads started in it) and saving the profile to a file.
+	:param mode: PROFILE_CPU (pstats file, open with python -m pstats or snakeviz) or PROFILE_MEMORY (text file with the biggest allocations).
+	:param path: Path of the file to save the profile to.
+	"""
+
+	if mode == PROFILE_CPU:
+		profilers = [cProfile.Profile()]
+		profilers_lock = threading.Lock()
+
+		def start_thread_profiler(*_):
+			# called on the first event of every new thread, the profiler replaces this function in the thread
+			profiler = cProfile.Profile()
+			with profilers_lock:
+				profilers.append(profiler)
+			profiler.enable()
+
+		threading.setprofile(start_thread_profiler)
+		profilers[0].enable()
+		try:
+			yield
+		finally:
+			profilers[0].disable()
+			threading.setprofile(None)
+			with profilers_lock:
+				stats = pstats.Stats(*profilers)
+			stats.dump_stats(path)
+
+	elif mode == PROFILE_MEMORY:
+		tracemalloc.start(25)
+		try:
+			yield
+		finally:
+			snapshot = tracemalloc.take_snapshot()
+			current, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+			with open(path, "w", encoding="utf-8") as profile_file:
+				profile_file.write(f"current: {current / 1024 / 1024:.1f} MiB, peak: {peak / 1024 / 1024:.1f} MiB\n\n")
+				for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+					profile_file.write(f"{stat}\n")
+
+	else:
+		raise ValueError(f"unknown profile mode: {mode}")
+
+def _escape_label(value) -> str:
+	return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
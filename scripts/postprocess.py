@@ -0,0 +1,88 @@
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+FFMPEG_WORKERS = 2  # number of ffmpeg processes running at the same time
+FFMPEG_QUEUE = 4  # number of downloaded videos waiting for ffmpeg, downloads wait when the queue is full (temporary files take disk space)
+STDERR_TAIL = 2000  # number of characters of ffmpeg's error output kept
+NO_WINDOW = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0  # ffmpeg is console program, it would open a window on Windows
+
+FfmpegResult = namedtuple("FfmpegResult", ["returncode", "stderr"])
+
+
+def run_ffmpeg(args) -> FfmpegResult:
+	"""
+	Runs ffmpeg (without showing any window) and waits for it to finish.
+	:param args: Command line (including ffmpeg path).
+	:return: Exit code (None if ffmpeg couldn't be started) and the end of its error output.
+	"""
+
+	try:
+		completed = subprocess.run(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, creationflags=NO_WINDOW)
+	except OSError as error:
+		return FfmpegResult(None, str(error))
+	return FfmpegResult(completed.returncode, completed.stderr.decode("utf-8", "replace")[-STDERR_TAIL:])
+
+def ffmpeg_error(result) -> str | None:
+	"""
+	Describes failed ffmpeg run.
+	:param result: FfmpegResult of the run.
+	:return: Error message, None if ffmpeg succeeded.
+	"""
+
+	if result.returncode == 0:
+		return None
+	lines = result.stderr.strip().splitlines()
+	if result.returncode is None:
+		return f"ffmpeg couldn't be started: {result.stderr}"
+	return f"ffmpeg exited with code {result.returncode}" + (f": {lines[-1]}" if lines else "")
+
+
+class PostProcessor:
+	"""
+	Bounded pool of ffmpeg workers, so videos are remuxed/merged while the next ones are being downloaded.
+	Jobs are queued, submitting waits while the queue is full.
+	"""
+
+	def __init__(self, workers=FFMPEG_WORKERS, queue_size=FFMPEG_QUEUE):
+		"""
+		:param workers: Number of jobs running at the same time.
+		:param queue_size: Number of jobs waiting for a worker.
+		"""
+
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmpeg")
+		self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+	def submit(self, function, *args, **kwargs):
+		"""
+		Queues post-processing job (waits while the queue is full).
+		:param function: Function doing the job (e.g. running run_ffmpeg and cleaning up after it).
+		:param args: Positional arguments of the function.
+		:param kwargs: Keyword arguments of the function.
+		:return: Future of the function's result.
+		"""
+
+		self.slots.acquire()
+		try:
+			future = self.executor.submit(function, *args, **kwargs)
+		except BaseException:
+			self.slots.release()
+			raise
+		future.add_done_callback(lambda _: self.slots.release())
+		return future
+
+	def shutdown(self):
+		"""
+		Waits for all queued jobs to finish and stops the workers.
+		"""
+
+		self.executor.shutdown(wait=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.shutdown()
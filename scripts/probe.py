@@ -0,0 +1,151 @@
+from collections import namedtuple
+from dataclasses import dataclass
+
+import requests
+import urllib3
+
+from scripts.bandwidth import CATEGORY_IMAGE
+
+
+PROBE_BYTES = 16 * 1024  # bytes requested to sniff image type and dimensions (JPEG dimensions come after EXIF data, which is usually smaller)
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}  # start of frame markers (contain dimensions)
+
+ProbeResult = namedtuple("ProbeResult", ["content_type", "size", "format", "width", "height", "body", "response"], defaults=(None, None))
+
+
+@dataclass(frozen=True)
+class ImageFilter:
+	"""
+	Rules images have to pass before they are downloaded (checked on the first bytes of the image, see probe_image).
+	Images whose size or dimensions can't be found out pass the corresponding rules.
+	min_width, min_height, max_width, max_height: Dimensions in pixels (e.g. min 2 skips 1x1 tracking pixels).
+	min_size, max_size: Size of the file in bytes.
+	"""
+
+	min_width: int | None = None
+	min_height: int | None = None
+	max_width: int | None = None
+	max_height: int | None = None
+	min_size: int | None = None
+	max_size: int | None = None
+
+
+def probe_image(session, url, scheduler, metrics=None, limiter=None) -> ProbeResult | None:
+	"""
+	Downloads the first PROBE_BYTES of the url (with Range request) to find out what it is without downloading it whole.
+	Images no bigger than PROBE_BYTES are downloaded whole, their body is returned so they don't have to be downloaded again.
+	:param session: HTTP session to use.
+	:param url: Url of the image.
+	:param scheduler: HostScheduler to make the request through.
+	:param metrics: JobMetrics to record the request and its size to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:return: Content type, size of the whole file, image format and dimensions (None when unknown),
+	         the whole body (None if only part of it was downloaded) and the (closed) response, None if request failed.
+	"""
+
+	headers = {"Range": f"bytes=0-{PROBE_BYTES - 1}", "Accept-Encoding": "identity"}
+	try:
+		with scheduler.request(session, "GET", url, metrics, headers=headers, stream=True) as response:
+			if response.status_code not in (200, 206):
+				return None
+			# server which ignores Range sends the whole file, the rest of it is never read
+			data = response.raw.read(PROBE_BYTES)
+	except (requests.RequestException, urllib3.exceptions.HTTPError):
+		return None
+	if limiter is not None:
+		limiter.consume(CATEGORY_IMAGE, len(data))
+	if metrics is not None:
+		metrics.count("probes")
+		metrics.add_bytes("probe", len(data))
+
+	size = None
+	if response.status_code == 206:
+		total = response.headers.get("Content-Range", "").rpartition("/")[2]
+		size = int(total) if total.isdigit() else None
+	elif response.headers.get("Content-Length", "").isdigit():
+		size = int(response.headers["Content-Length"])
+
+	# body is complete if it has the announced size, or if the server without Range support ended it before PROBE_BYTES
+	complete = size == len(data) if size is not None else response.status_code == 200 and len(data) < PROBE_BYTES
+	if response.headers.get("Content-Encoding", "identity").lower() != "identity":
+		complete = False  # raw data is compressed
+
+	content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower() or None
+	return ProbeResult(content_type, size, *sniff_image(data), data if complete else None, response)
+
+def sniff_image(data) -> tuple[str | None, int | None, int | None]:
+	"""
+	Finds image format and dimensions from the first bytes of a file.
+	Supports PNG, GIF, JPEG, WebP, BMP (with dimensions), SVG and AVIF (without dimensions).
+	:param data: Beginning of the file.
+	:return: Format (used as file extension), width and height (None when unknown), (None, None, None) if data isn't an image.
+	"""
+
+	if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+		return "png", int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+	if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+		return "gif", int.from_bytes(data[6:8], "little"), int.from_bytes(data[8:10], "little")
+	if data.startswith(b"\xff\xd8"):
+		return ("jpg", *_jpeg_dimensions(data))
+	if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+		return ("webp", *_webp_dimensions(data))
+	if data.startswith(b"BM") and len(data) >= 26:
+		return "bmp", int.from_bytes(data[18:22], "little", signed=True), abs(int.from_bytes(data[22:26], "little", signed=True))
+	if data[4:12] in (b"ftypavif", b"ftypavis"):
+		return "avif", None, None
+	head = data[:1024].lstrip().lower()
+	if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+		return "svg", None, None
+	return None, None, None
+
+def rejection(probe, image_filter) -> str | None:
+	"""
+	Checks probed image against filter.
+	:param probe: ProbeResult of the image.
+	:param image_filter: ImageFilter to check.
+	:return: Why image is rejected, None if it passes.
+	"""
+
+	if probe.format is None and not (probe.content_type or "").startswith("image/"):
+		return f"not an image ({probe.content_type})"
+	if probe.size is not None:
+		if image_filter.min_size is not None and probe.size < image_filter.min_size:
+			return f"file too small ({probe.size} bytes)"
+		if image_filter.max_size is not None and probe.size > image_filter.max_size:
+			return f"file too big ({probe.size} bytes)"
+	if probe.width is not None and probe.height is not None:
+		if (image_filter.min_width is not None and probe.width < image_filter.min_width) or \
+		   (image_filter.min_height is not None and probe.height < image_filter.min_height):
+			return f"image too small ({probe.width}x{probe.height})"
+		if (image_filter.max_width is not None and probe.width > image_filter.max_width) or \
+		   (image_filter.max_height is not None and probe.height > image_filter.max_height):
+			return f"image too big ({probe.width}x{probe.height})"
+	return None
+
+def _jpeg_dimensions(data) -> tuple[int | None, int | None]:
+	position = 2
+	while position + 9 <= len(data):
+		if data[position] != 0xFF:
+			return None, None  # not a marker, broken file
+		marker = data[position + 1]
+		if marker == 0xFF:  # padding
+			position += 1
+			continue
+		if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # markers without length
+			position += 2
+			continue
+		if marker in JPEG_SOF:
+			return int.from_bytes(data[position + 7:position + 9], "big"), int.from_bytes(data[position + 5:position + 7], "big")
+		position += 2 + int.from_bytes(data[position + 2:position + 4], "big")
+	return None, None
+
+def _webp_dimensions(data) -> tuple[int | None, int | None]:
+	chunk = data[12:16]
+	if chunk == b"VP8 " and len(data) >= 30:
+		return int.from_bytes(data[26:28], "little") & 0x3FFF, int.from_bytes(data[28:30], "little") & 0x3FFF
+	if chunk == b"VP8L" and len(data) >= 25:
+		bits = int.from_bytes(data[21:25], "little")
+		return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+	if chunk == b"VP8X" and len(data) >= 30:
+		return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+	return None, None
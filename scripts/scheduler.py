@@ -0,0 +1,225 @@
+import contextlib
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+
+HOST_CONCURRENCY = 4  # number of requests to single host at the same time before the limit adapts
+MAX_HOST_CONCURRENCY = 16  # upper bound of adapted per-host limit
+DECREASE_FACTOR = 0.5  # per-host limit is multiplied by this when host is overloaded
+LATENCY_FACTOR = 3  # host is overloaded if its response takes this many times longer than its average response
+LATENCY_SMOOTHING = 0.2  # weight of the newest response in the average latency
+MIN_SLOW_LATENCY = 0.1  # responses faster than this (in seconds) never count as slow
+DECREASE_INTERVAL = 1  # minimum number of seconds between two decreases of the same host
+MAX_RETRIES = 5  # number of retries of single request
+BACKOFF_BASE = 0.5  # delay before first retry in seconds (doubled with every next retry)
+BACKOFF_MAX = 60  # maximum delay between retries in seconds
+RETRY_AFTER_MAX = 300  # longer Retry-After is treated as permanent failure
+REQUEST_TIMEOUT = (10, 60)  # connect and read timeout of requests in seconds
+THROTTLE_STATUSES = [429, 503]  # host asks to slow down
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+def backoff_delay(attempt) -> float:
+	"""
+	Returns delay before given retry (exponential backoff with full jitter).
+	:param attempt: Number of retry (0 for the first one).
+	:return: Delay in seconds.
+	"""
+
+	return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after(response) -> float | None:
+	"""
+	Parses Retry-After header of response.
+	:param response: Response to parse.
+	:return: Number of seconds to wait, None if header is missing or invalid.
+	"""
+
+	value = response.headers.get("Retry-After")
+	if value is None:
+		return None
+	if value.strip().isdigit():
+		return float(value)
+	try:
+		date = email.utils.parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return None
+	return max(0.0, date.timestamp() - time.time())
+
+def ydl_retry_options() -> dict:
+	"""
+	Returns yt-dlp options which make it retry the same way as HostScheduler (yt-dlp makes its own requests).
+	:return: Options to add to yt-dlp's options.
+	"""
+
+	sleep = {kind: lambda n: backoff_delay(n) for kind in ("http", "fragment", "extractor")}
+	return {
+		"retries": MAX_RETRIES,
+		"fragment_retries": MAX_RETRIES,
+		"extractor_retries": MAX_RETRIES,
+		"retry_sleep_functions": sleep,
+		"socket_timeout": REQUEST_TIMEOUT[1],
+	}
+
+
+class HostScheduler:
+	"""
+	Limits number of concurrent requests to every host and retries requests which failed temporarily.
+	Per-host limit adapts to the host (additive increase, multiplicative decrease): it grows slowly while the host responds fast,
+	and is cut when the host throttles (429, 503) or its responses get much slower than its recent average.
+	Retry-After of throttled responses is honored by all requests to that host.
+	Single scheduler is meant to be shared by all download threads (and jobs).
+	"""
+
+	def __init__(self, concurrency=HOST_CONCURRENCY, max_concurrency=MAX_HOST_CONCURRENCY, max_retries=MAX_RETRIES):
+		"""
+		:param concurrency: Initial number of concurrent requests per host.
+		:param max_concurrency: Maximum number of concurrent requests per host.
+		:param max_retries: Number of retries of single request.
+		"""
+
+		self.condition = threading.Condition()
+		self.hosts = {}
+		self.concurrency = concurrency
+		self.max_concurrency = max_concurrency
+		self.max_retries = max_retries
+
+	@contextlib.contextmanager
+	def request(self, session, method, url, metrics=None, **kwargs):
+		"""
+		Context manager making HTTP request, host slot is held until the context exits (so streamed body is downloaded in it).
+		Connection errors, timeouts and responses with RETRY_STATUSES are retried, last response is returned if retries run out.
+		:param session: HTTP session to use.
+		:param method: HTTP method.
+		:param url: Url to request.
+		:param metrics: JobMetrics to record request latency, retries and throttling to.
+		:param kwargs: Arguments of requests.Session.request.
+		:return: Response (closed when the context exits).
+		:raises requests.RequestException: If the request failed on every attempt.
+		"""
+
+		kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+		netloc = urlsplit(url).netloc.lower()
+		host = self._host(netloc)
+
+		attempt = 0
+		while True:
+			self._acquire(host)
+			try:
+				response = session.request(method, url, **kwargs)
+			except (requests.ConnectionError, requests.Timeout):
+				self._release(host)
+				if attempt >= self.max_retries:
+					raise
+				if metrics is not None:
+					metrics.count("retries")
+				time.sleep(backoff_delay(attempt))
+				attempt += 1
+				continue
+			except BaseException:
+				# other errors (e.g. too many redirects, invalid url) aren't retried, but the slot has to be released
+				self._release(host)
+				raise
+
+			if metrics is not None:
+				metrics.observe_latency(netloc, response.elapsed.total_seconds())
+			if response.status_code not in RETRY_STATUSES:
+				self._success(host, response.elapsed.total_seconds())
+				try:
+					yield response
+				finally:
+					response.close()
+					self._release(host)
+				return
+
+			delay = retry_after(response)
+			if response.status_code in THROTTLE_STATUSES:
+				self._throttle(host, delay)
+				if metrics is not None:
+					metrics.count("throttled")
+			if attempt >= self.max_retries or (delay is not None and delay > RETRY_AFTER_MAX):
+				try:
+					yield response
+				finally:
+					response.close()
+					self._release(host)
+				return
+			response.close()
+			self._release(host)
+			if metrics is not None:
+				metrics.count("retries")
+			time.sleep(backoff_delay(attempt) if delay is None else delay)
+			attempt += 1
+
+	def limit(self, netloc) -> float:
+		"""
+		Returns current concurrency limit of given host.
+		:param netloc: Host (and port) as in url.
+		"""
+
+		with self.condition:
+			return self._host(netloc.lower()).limit
+
+	def _host(self, netloc) -> "_HostState":
+		with self.condition:
+			host = self.hosts.get(netloc)
+			if host is None:
+				host = self.hosts[netloc] = _HostState(self.concurrency)
+			return host
+
+	def _acquire(self, host):
+		with self.condition:
+			while True:
+				wait = host.not_before - time.monotonic()
+				if wait <= 0 and host.in_flight < int(host.limit):
+					host.in_flight += 1
+					return
+				self.condition.wait(timeout=wait if wait > 0 else None)
+
+	def _release(self, host):
+		with self.condition:
+			host.in_flight -= 1
+			self.condition.notify_all()
+
+	def _success(self, host, latency):
+		with self.condition:
+			if host.latency is None:
+				host.latency = latency
+			now = time.monotonic()
+			if latency > LATENCY_FACTOR * host.latency and latency > MIN_SLOW_LATENCY:
+				# responses got much slower, host (or the link to it) is overloaded
+				if now - host.decreased >= DECREASE_INTERVAL:
+					host.limit = max(1.0, host.limit * DECREASE_FACTOR)
+					host.decreased = now
+			else:
+				# one more slot after a whole window of fast responses
+				host.limit = min(float(self.max_concurrency), host.limit + 1 / host.limit)
+			host.latency += LATENCY_SMOOTHING * (latency - host.latency)
+			self.condition.notify_all()
+
+	def _throttle(self, host, delay):
+		with self.condition:
+			now = time.monotonic()
+			if now - host.decreased >= DECREASE_INTERVAL:
+				host.limit = max(1.0, host.limit * DECREASE_FACTOR)
+				host.decreased = now
+			if delay is not None:
+				host.not_before = max(host.not_before, now + min(delay, RETRY_AFTER_MAX))
+
+
+class _HostState:
+	"""
+	Scheduling state of single host (guarded by scheduler's condition).
+	"""
+
+	def __init__(self, limit):
+		self.limit = float(limit)
+		self.in_flight = 0
+		self.not_before = 0.0  # monotonic time before which no request can be sent (Retry-After)
+		self.latency = None  # average latency (exponentially weighted)
+		self.decreased = float("-inf")  # monotonic time of the last decrease
@@ -0,0 +1,26 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+REQ_HEAD = {
+	"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/113.0",
+	"Accept-Encoding": "gzip, deflate",
+}
+POOL_SIZE = 8  # number of keep-alive connections kept open per host
+
+
+def create_session(pool_size=POOL_SIZE) -> requests.Session:
+	"""
+	Creates HTTP session that keeps connections alive and can be shared between download threads.
+	:param pool_size: Maximum number of connections kept open per host (should be at least the number of workers).
+	:return: Configured session.
+	"""
+
+	adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+	session = requests.Session()
+	session.headers.update(REQ_HEAD)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+
+	return session
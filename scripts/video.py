@@ -1,283 +1,455 @@
-import copy
-import io
+import functools
 import os
-import subprocess
-import sys
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from pathvalidate import sanitize_filename
-from yt_dlp import YoutubeDL
 
-
-def download_videos(website, save_folder, ffmpeg_path):
+from scripts.archive import archive_id, VideoArchive
+from scripts.bandwidth import CATEGORY_VIDEO
+from scripts.events import EVENT_DONE, EVENT_FAILED, EVENT_FILE, EVENT_SKIPPED, JobEvents, QuietLogger
+from scripts.formats import DEFAULT_POLICY, select_formats
+from scripts.journal import JobJournal, STATE_DONE, STATE_MUXED, STATE_PARTIAL, STATE_PENDING
+from scripts.metrics import JobMetrics, STAGE_EXTRACT, STAGE_FFMPEG, STAGE_STREAM, STAGE_TRANSFER
+from scripts.postprocess import FFMPEG_WORKERS, ffmpeg_error, PostProcessor, run_ffmpeg
+from scripts.scheduler import ydl_retry_options
+
+
+VIDEO_WORKERS = 3  # number of videos downloaded at the same time
+FRAGMENT_WORKERS = 4  # number of fragments of single HLS/DASH download downloaded at the same time
+STREAM_MUX = False  # let ffmpeg download plain HTTP formats itself (no intermediate files, but no progress, rate limit or resume either)
+STREAM_PROTOCOLS = ['http', 'https']
+STREAM_UNSUPPORTED = ['downloader_options', 'fragments', 'cookies']  # format keys meaning yt-dlp has to download the format itself
+FFMPEG_OPTIONS = ['-y', '-nostdin', '-hide_banner', '-loglevel', 'error']  # overwrite output, only errors are written to stderr
+ENTRIES_IN_FLIGHT = 2  # playlist entries taken ahead per worker (the rest of the playlist isn't extracted until they are processed)
+SYNC = False  # skip videos already in the download archive (or in the save folder) and reuse recent extraction results
+
+def download_videos(website, save_folder, ffmpeg_path, policy=DEFAULT_POLICY, workers=VIDEO_WORKERS, fragment_workers=FRAGMENT_WORKERS, stream=STREAM_MUX,
+                    events=None, ffmpeg_workers=FFMPEG_WORKERS, metrics=None, sync=SYNC, limiter=None) -> dict | None:
+	"""
+	Downloads all videos from given website (single video or every entry of a playlist) and saves them to given folder.
+	Playlist entries are enumerated lazily and every entry is extracted just before it is downloaded,
+	so the first video starts downloading right away and only entries being processed are kept in memory.
+	Downloaded videos are remuxed/merged by a pool of ffmpeg workers while the next ones are downloading.
+	Every saved video is recorded in download archive of the save folder. In sync mode archived videos are skipped
+	before their entries are even extracted, so synchronizing a playlist or channel again only resolves new entries.
+	:param website: Website to download videos from.
+	:param save_folder: Folder to save videos to.
+	:param ffmpeg_path: Path of ffmpeg executable (used to merge video and audio).
+	:param policy: FormatPolicy used to choose video and audio format.
+	:param workers: Number of videos (playlist entries) downloaded at the same time.
+	:param fragment_workers: Number of fragments downloaded at the same time (for HLS/DASH formats).
+	:param stream: Let ffmpeg download plain HTTP formats itself, instead of downloading them to temporary files first.
+	:param events: JobEvents to report progress to.
+	:param ffmpeg_workers: Number of videos remuxed/merged at the same time.
+	:param metrics: JobMetrics to record timings, counts and sizes to.
+	:param sync: Skip videos which were already downloaded (archived, or saved under the same name) and reuse recent extraction results.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:return: Dictionary mapping video url to whether it was downloaded, None if website couldn't be extracted.
+	"""
 
 	if not os.path.isdir(save_folder):
 		os.mkdir(save_folder)
 
-	sys.stdout = open(os.devnull, "w")
-	sys.stderr = open(os.devnull, "w")
+	from yt_dlp import YoutubeDL  # imported only when needed (it is slow to import)
+
+	if events is None:
+		events = JobEvents()
+	if metrics is None:
+		metrics = JobMetrics()
 
 	ydl_opts = {
 		"ignoreerrors": True,
+		"quiet": True,
+		"logger": QuietLogger(),
+		"lazy_playlist": True,
+		**ydl_retry_options(),
 	}
-	with YoutubeDL(ydl_opts) as ydl:
-		info_dict = ydl.extract_info(website, download=False)
-
-	if "entries" in info_dict.keys():
-		for entry_ind in range(len(info_dict["entries"])):
-			if info_dict["entries"][entry_ind] is None:
-				continue
-			process_video(website, save_folder, copy.deepcopy(info_dict["entries"][entry_ind]), ffmpeg_path, entry_ind + 1)
-	else:
-		process_video(website, save_folder, copy.deepcopy(info_dict), ffmpeg_path)
-
-def process_video(website, save_folder, info, ffmpeg_path, playlist_index=None) -> bool:
-	# get video title
+	ydl = YoutubeDL(ydl_opts)
+	events.subscribe(metrics.count_event)
 	try:
-		video_title = info["title"]
-		video_title = video_title.strip()
-		video_title = sanitize_filename(video_title)
-	except KeyError:
-		return False
-
-	# find the best video format
-
-	# copy the list of available formats to avoid modifying the original list
-	try:
-		available_formats = copy.deepcopy(info["formats"][::-1])
-		# formats are sorted worst to best, so we reverse the list to get the best first
-	except KeyError:
-		return False
-
-	# remove formats without video
-	deleted = 0
-	for fmt_ind in range(len(available_formats)):
-		try:
-			if available_formats[fmt_ind - deleted]["vcodec"] == "none":
-				available_formats.pop(fmt_ind - deleted)
-				deleted += 1
-		except KeyError:
-			pass
-
-	# find video with the highest resolution
-	max_width = 0
-	for fmt in available_formats:
-		try:
-			curr_width = fmt["width"]
-			if curr_width > max_width:
-				max_width = curr_width
-		except KeyError:
-			pass
-	if max_width == 0:
-		return False
-
-	# remove formats with lower resolution
-	deleted = 0
-	for fmt_ind in range(len(available_formats)):
-		try:
-			if available_formats[fmt_ind - deleted]["width"] != max_width:
-				available_formats.pop(fmt_ind - deleted)
-				deleted += 1
-		except KeyError:
-			available_formats.pop(fmt_ind - deleted)
-			deleted += 1
-
-	# find video with the biggest file size (highest quality)
-	max_size = 0
-	for fmt in available_formats:
-		try:
-			if fmt["filesize"] is None:
-				raise KeyError
-			elif fmt["filesize"] > max_size:
-				max_size = fmt["filesize"]
-		except KeyError:
+		# only the first page of a playlist is extracted here, entries are extracted one by one later
+		with metrics.time(STAGE_EXTRACT):
+			info_dict = ydl.extract_info(website, download=False, process=False)
+			while info_dict is not None and info_dict.get("_type") in ("url", "url_transparent"):
+				info_dict = ydl.extract_info(info_dict["url"], download=False, ie_key=info_dict.get("ie_key"), process=False)
+		if info_dict is None:
+			events.emit(EVENT_DONE, url=website)
+			return None
+
+		# resume interrupted run of the same job
+		journal = JobJournal(save_folder, f"videos {website}")
+		archive = VideoArchive(save_folder)
+		results = {}
+		results_lock = threading.Lock()
+		errors = []
+
+		def process_entry(entry, extra):
+			unresolved = entry.get("_type") in ("url", "url_transparent")
+			if unresolved and (journal.state(entry["url"]) == STATE_DONE or (sync and archive.downloaded(entry))):
+				# finished before the job was interrupted or in previous sync, no need to extract it again
+				events.emit(EVENT_SKIPPED, url=entry["url"])
+				entry_results = {entry["url"]: True}
+			else:
+				info = archive.get_extraction(entry["url"]) if sync and unresolved else None
+				if info is None:
+					# every thread needs its own YoutubeDL
+					with YoutubeDL(ydl_opts) as entry_ydl, metrics.time(STAGE_EXTRACT):
+						info = entry_ydl.process_ie_result(entry, download=False, extra_info=extra)
+						if info is not None and sync and unresolved:
+							info = entry_ydl.sanitize_info(info)
+							archive.put_extraction(entry["url"], info)
+				if info is None:
+					entry_results = {entry.get("url", entry_key(entry)): False}
+				else:
+					entry_results = {}
+					for video in _videos(info):
+						result = process_entry_video(video)
+						if isinstance(result, Future):
+							# only key of the video is kept until it is muxed, not its info dict
+							result.add_done_callback(functools.partial(video_done, entry_key(video)))
+						else:
+							entry_results[entry_key(video)] = result
+			with results_lock:
+				results.update(entry_results)
+
+		def video_done(key, future):
+			if future.exception() is not None:
+				errors.append(future.exception())
+			with results_lock:
+				results[key] = future.exception() is None and future.result()
+
+		def process_entry_video(info):
+			output_file = output_path(save_folder, info)
+			if sync and archive.downloaded(info, output_file):
+				events.emit(EVENT_SKIPPED, url=info.get("webpage_url"))
+				return True
+			state = journal.state(entry_key(info))
+			if state is None:
+				journal.record(entry_key(info), STATE_PENDING)
+			elif state == STATE_MUXED:
+				# only temporary files weren't removed
+				_remove_files(journal.get(entry_key(info)).get("temps", ()))
+				journal.record(entry_key(info), STATE_DONE)
+			if state in (STATE_MUXED, STATE_DONE):
+				events.emit(EVENT_SKIPPED, url=info.get("webpage_url"))
+				return True
 			try:
-				if fmt["filesize_approx"] is None:
-					raise KeyError
-				elif fmt["filesize_approx"] > max_size:
-					max_size = fmt["filesize_approx"]
-			except KeyError:
-				pass
-		except TypeError:
-			pass
-	if max_size == 0:
-		return False
+				return process_video(save_folder, info, ffmpeg_path, policy, fragment_workers, stream, events, journal, postprocessor, metrics, limiter, archive)
+			except OSError as error:
+				events.emit(EVENT_FAILED, url=info.get("webpage_url"), error=str(error))
+				return False
 
-	# remove formats with lower quality
-	deleted = 0
-	for fmt_ind in range(len(available_formats)):
 		try:
-			if available_formats[fmt_ind - deleted]["filesize"] is None:
-				raise KeyError
-			elif available_formats[fmt_ind - deleted]["filesize"] < max_size * 0.95:
-				available_formats.pop(fmt_ind - deleted)
-				deleted += 1
-		except KeyError:
-			try:
-				if available_formats[fmt_ind - deleted]["filesize_approx"] is None:
-					raise KeyError
-				elif available_formats[fmt_ind - deleted]["filesize_approx"] < max_size * 0.95:
-					available_formats.pop(fmt_ind - deleted)
-					deleted += 1
-			except KeyError:
-				available_formats.pop(fmt_ind - deleted)
-				deleted += 1
-
-	# store the id of the best video format
-	best_video = available_formats[0]["format_id"]
+			# entry workers are done before the postprocessor is shut down (it waits for the remaining ffmpeg jobs)
+			with PostProcessor(ffmpeg_workers) as postprocessor, ThreadPoolExecutor(max_workers=workers) as executor:
+				# entries are read from the playlist only as fast as they are processed
+				slots = threading.BoundedSemaphore(workers * ENTRIES_IN_FLIGHT)
+
+				def entry_done(future):
+					if future.exception() is not None:
+						errors.append(future.exception())
+					slots.release()
+
+				for entry, extra in _playlist_entries(ydl, info_dict):
+					slots.acquire()
+					executor.submit(process_entry, entry, extra).add_done_callback(entry_done)
+			if errors:
+				raise errors[0]
+			journal.finish()
+			events.emit(EVENT_DONE, url=website)
+		except BaseException:
+			journal.close()
+			raise
+		finally:
+			archive.close()
+	finally:
+		events.unsubscribe(metrics.count_event)
+		ydl.close()
+	return results
+
+def _playlist_entries(ydl, info_dict):
+	"""
+	Lazily enumerates entries of a playlist (or the video itself if website isn't a playlist).
+	:param ydl: YoutubeDL which extracted the playlist.
+	:param info_dict: Unprocessed info dict (extracted with process=False).
+	:return: Generator of unprocessed entries and the extra info they get from the playlist.
+	"""
+
+	if info_dict.get("_type") not in ("playlist", "multi_video"):
+		yield info_dict, {}
+		return
+
+	from yt_dlp.utils import PlaylistEntries
+
+	extra = {key: info_dict[key] for key in ("webpage_url", "original_url", "webpage_url_basename", "webpage_url_domain", "extractor", "extractor_key")
+	         if key in info_dict}
+	extra.update(playlist=info_dict.get("title") or info_dict.get("id"), playlist_id=info_dict.get("id"), playlist_title=info_dict.get("title"))
+	for playlist_index, entry in PlaylistEntries(ydl, info_dict).get_requested_items():
+		if entry:
+			yield entry, dict(extra, playlist_index=playlist_index)
+
+def _videos(info):
+	# entry can itself be a playlist (e.g. channel tabs), its entries are already extracted
+	if "entries" not in info:
+		yield info
+		return
+	for entry in info["entries"] or ():
+		if entry is not None:
+			yield from _videos(entry)
+
+def entry_key(info) -> str:
+	"""
+	Returns key identifying video (in results and job journal).
+	:param info: Info dict of the video.
+	:return: Url of the video (with its id appended if url doesn't contain it, e.g. for many videos embedded in the same page),
+	         its id if url is unknown.
+	"""
+
+	url = info.get("webpage_url")
+	video_id = info.get("id")
+	if url is None:
+		return video_id
+	if video_id is None or video_id in url:
+		return url
+	return f"{url}#{video_id}"
+
+def output_path(save_folder, info) -> str | None:
+	"""
+	Returns path video is saved to (named by its title).
+	:param save_folder: Folder to save video to.
+	:param info: Info dict of the video.
+	:return: Path of the video file, None if video has no title.
+	"""
 
-	# find the best audio format
-
-	# copy the list of available formats to avoid modifying the original list
 	try:
-		available_formats = copy.deepcopy(info["formats"][::-1])
-		# formats are sorted worst to best, so we reverse the list to get the best first
+		video_title = info["title"]
 	except KeyError:
+		return None
+	return os.path.join(save_folder, sanitize_filename(video_title.strip()) + '.mp4')
+
+def process_video(save_folder, info, ffmpeg_path, policy=DEFAULT_POLICY, fragment_workers=FRAGMENT_WORKERS, stream=STREAM_MUX, events=None, journal=None,
+                  postprocessor=None, metrics=None, limiter=None, archive=None) -> Future:
+	"""
+	Downloads single video (in the best video and audio format) and saves it to given folder.
+	Video is downloaded in the calling thread, remuxing/merging of downloaded files is queued in postprocessor.
+	:param save_folder: Folder to save video to.
+	:param info: Info dict of the video (as returned by extract_info).
+	:param ffmpeg_path: Path of ffmpeg executable (used to merge video and audio).
+	:param policy: FormatPolicy used to choose video and audio format.
+	:param fragment_workers: Number of fragments downloaded at the same time (for HLS/DASH formats).
+	:param stream: Let ffmpeg download plain HTTP formats itself, instead of downloading them to temporary files first.
+	:param events: JobEvents to report progress to.
+	:param journal: JobJournal of the job, used to record progress so the download can be resumed.
+	:param postprocessor: PostProcessor to remux/merge the video in, ffmpeg runs in the calling thread if not given.
+	:param metrics: JobMetrics to record timings and sizes to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit (streaming is turned off when videos are limited).
+	:param archive: VideoArchive to record saved video in, None to not record it.
+	:return: Future resolved with True if video was saved (already resolved if it didn't need postprocessor).
+	"""
+
+	if events is None:
+		events = JobEvents()
+	if metrics is None:
+		metrics = JobMetrics()
+	url = info.get("webpage_url")
+	key = entry_key(info)
+
+	output_file = output_path(save_folder, info)
+	if output_file is None:
+		events.emit(EVENT_FAILED, url=url, error="video has no title")
+		return _resolved(False)
+
+	# find the best video and audio format
+	best_video, best_audio = select_formats(info.get("formats", ()), policy)
+	if best_video is None:
+		events.emit(EVENT_FAILED, url=url, error="no usable video format")
+		return _resolved(False)
+
+	# here we have the best video and audio formats (their ids), and the output file
+	formats = {fmt["format_id"]: fmt for fmt in info["formats"]}
+
+	# temporary files always have the same names in the same job, so yt-dlp can continue interrupted downloads
+	# (other jobs downloading the same video don't touch them)
+	owner = journal.tag if journal is not None else uuid.uuid4().hex[:16]
+	temp_files = []
+	for format_id, role in ((best_video, "video"), (best_audio, "audio")) if best_video != best_audio else ((best_video, "video"), ):
+		temp_file = os.path.join(save_folder, f"{info.get('id')}_media_scraper_{owner}_{role}_.{formats[format_id].get('ext')}")
+		temp_files.extend((temp_file, temp_file + ".part"))
+	if journal is not None:
+		journal.record(key, STATE_PARTIAL, temps=temp_files)
+
+	if stream and (limiter is None or limiter.rate(CATEGORY_VIDEO) is None):
+		# let ffmpeg read both formats straight from the server, no intermediate files are written
+		if _stream_formats(ffmpeg_path, formats[best_video], formats[best_audio] if best_audio != best_video else None, output_file, metrics):
+			if journal is not None:
+				journal.record(key, STATE_DONE)
+			if archive is not None:
+				archive.add_id(archive_id(info), url, output_file)
+			events.emit(EVENT_FILE, url=url, path=output_file)
+			return _resolved(True)
+
+	# download video and audio at the same time
+	# (under different names, so they don't overwrite each other when they have the same extension)
+	with ThreadPoolExecutor(max_workers=2) as executor:
+		video_future = executor.submit(_download_format, info, best_video, save_folder, "video", owner, fragment_workers, events, metrics, limiter)
+		if best_video != best_audio:
+			audio_future = executor.submit(_download_format, info, best_audio, save_folder, "audio", owner, fragment_workers, events, metrics, limiter)
+			audio_file = audio_future.result()
+		else:
+			audio_file = None
+		video_file = video_future.result()
+
+	if video_file is None or (best_video != best_audio and audio_file is None):
+		if journal is None:
+			_remove_files(file for file in (video_file, audio_file) if file is not None)
+		events.emit(EVENT_FAILED, url=url, error="download failed")
+		return _resolved(False)
+
+	# here we have the video and audio files downloaded, ffmpeg can run while the next video downloads
+	# (only the key, url and archive id of the video are passed on, info dict doesn't have to be kept in memory until then)
+	video = (key, url, archive_id(info))
+	if postprocessor is None:
+		return _resolved(_mux(ffmpeg_path, video, video_file, audio_file, output_file, events, journal, metrics, archive))
+	return postprocessor.submit(_mux, ffmpeg_path, video, video_file, audio_file, output_file, events, journal, metrics, archive)
+
+def _mux(ffmpeg_path, video, video_file, audio_file, output_file, events, journal, metrics, archive) -> bool:
+	"""
+	Remuxes (or merges with audio) downloaded video into output file, and removes downloaded files.
+	:param ffmpeg_path: Path of ffmpeg executable.
+	:param video: Key (see entry_key), url and archive id of the video.
+	:param video_file: Downloaded video.
+	:param audio_file: Downloaded audio, None if video has audio.
+	:param output_file: Path of resulting file.
+	:param events: JobEvents to report result to.
+	:param journal: JobJournal of the job.
+	:param metrics: JobMetrics to record ffmpeg time to.
+	:param archive: VideoArchive to record saved video in, None to not record it.
+	:return: True if output file was created.
+	"""
+
+	key, url, video_id = video
+
+	with metrics.time(STAGE_FFMPEG):
+		if audio_file is None:
+			# remux with ffmpeg
+			result = run_ffmpeg([ffmpeg_path, *FFMPEG_OPTIONS, '-i', video_file, '-c', 'copy', output_file])
+		else:
+			# merge with ffmpeg
+			result = run_ffmpeg([ffmpeg_path, *FFMPEG_OPTIONS, '-an', '-i', video_file, '-vn', '-i', audio_file, '-c', 'copy', output_file])
+	muxed = result.returncode == 0
+
+	if journal is not None and muxed:
+		journal.record(key, STATE_MUXED, temps=[video_file] if audio_file is None else [video_file, audio_file])
+	if not muxed:
+		# don't leave incomplete file behind
+		_remove_files([output_file])
+	_remove_files(file for file in (video_file, audio_file) if file is not None)
+	if journal is not None and muxed:
+		journal.record(key, STATE_DONE)
+	if archive is not None and muxed:
+		archive.add_id(video_id, url, output_file)
+
+	if muxed:
+		events.emit(EVENT_FILE, url=url, path=output_file)
+	else:
+		events.emit(EVENT_FAILED, url=url, error=ffmpeg_error(result))
+	return muxed
+
+def _stream_formats(ffmpeg_path, video_format, audio_format, output_file, metrics) -> bool:
+	"""
+	Remuxes/merges formats into output file while they are being downloaded by ffmpeg.
+	Works only for formats available as plain HTTP files (not for HLS/DASH fragments),
+	which yt-dlp doesn't download in a special way (e.g. YouTube formats are downloaded in chunks, because unranged requests are throttled).
+	:param ffmpeg_path: Path of ffmpeg executable.
+	:param video_format: Format dict of video.
+	:param audio_format: Format dict of audio, None if video format has audio.
+	:param output_file: Path of resulting file.
+	:param metrics: JobMetrics to record streaming time and size to.
+	:return: True if output file was created, False if formats can't be streamed or ffmpeg failed.
+	"""
+
+	formats = [video_format] if audio_format is None else [video_format, audio_format]
+	if any(fmt.get("protocol") not in STREAM_PROTOCOLS or not fmt.get("url") or any(fmt.get(key) for key in STREAM_UNSUPPORTED) for fmt in formats):
 		return False
 
-	# remove formats without audio
-	deleted = 0
-	for fmt_ind in range(len(available_formats)):
-		try:
-			if available_formats[fmt_ind - deleted]["vcodec"] != "none":
-				available_formats.pop(fmt_ind - deleted)
-				deleted += 1
-		except KeyError:
-			available_formats.pop(fmt_ind - deleted)
-			deleted += 1
-
-	if len(available_formats) == 0:
-		# if there is no audio only format, assume the best video format has audio
-		best_audio = best_video
-	else:
-		# find audio with the biggest file size (highest quality)
-		max_size = 0
-		for fmt in available_formats:
-			try:
-				if fmt["filesize"] is None:
-					raise KeyError
-				elif fmt["filesize"] > max_size:
-					max_size = fmt["filesize"]
-			except KeyError:
-				try:
-					if fmt["filesize_approx"] is None:
-						raise KeyError
-					elif fmt["filesize_approx"] > max_size:
-						max_size = fmt["filesize_approx"]
-				except KeyError:
-					pass
-			except TypeError:
-				pass
-		if max_size == 0:
-			return False
-
-		# remove formats with lower quality
-		deleted = 0
-		for fmt_ind in range(len(available_formats)):
-			try:
-				if available_formats[fmt_ind - deleted]["filesize"] is None:
-					raise KeyError
-				elif available_formats[fmt_ind - deleted]["filesize"] < max_size * 0.95:
-					available_formats.pop(fmt_ind - deleted)
-					deleted += 1
-			except KeyError:
-				try:
-					if available_formats[fmt_ind - deleted]["filesize_approx"] is None:
-						raise KeyError
-					elif available_formats[fmt_ind - deleted]["filesize_approx"] < max_size * 0.95:
-						available_formats.pop(fmt_ind - deleted)
-						deleted += 1
-				except KeyError:
-					available_formats.pop(fmt_ind - deleted)
-					deleted += 1
-
-		# store the id of the best audio format
-		best_audio = available_formats[0]["format_id"]
-
-	# here we have the best video and audio formats (their ids), and the video title
-
-	# download video
-	# redirect stdout to capture the output file name
-	old_stdout = sys.stdout
-	new_stdout = io.StringIO()
-	sys.stdout = new_stdout
+	inputs = []
+	for fmt, stream_filter in zip(formats, [[], []] if audio_format is None else [['-an'], ['-vn']]):
+		headers = "".join(f"{key}: {value}\r\n" for key, value in fmt.get("http_headers", {}).items())
+		if headers:
+			inputs.extend(('-headers', headers))
+		inputs.extend(stream_filter)
+		inputs.extend(('-i', fmt["url"]))
+
+	with metrics.time(STAGE_STREAM):
+		result = run_ffmpeg([ffmpeg_path, *FFMPEG_OPTIONS, *inputs, '-c', 'copy', output_file])
+	if result.returncode == 0:
+		metrics.add_bytes("video", os.path.getsize(output_file) if os.path.isfile(output_file) else 0)
+		return True
+	_remove_files([output_file])
+	return False
+
+def _remove_files(files):
+	for file in files:
+		if os.path.isfile(file):
+			os.remove(file)
+
+def _resolved(result) -> Future:
+	future = Future()
+	future.set_result(result)
+	return future
+
+def _download_format(info, format_id, save_folder, role, owner, fragment_workers, events, metrics, limiter) -> str | None:
+	"""
+	Downloads one format of already extracted video (without extracting it again).
+	:param info: Info dict of the video (as returned by extract_info).
+	:param format_id: Id of the format to download.
+	:param save_folder: Folder to download to.
+	:param role: "video" or "audio", becomes part of the filename.
+	:param owner: Tag of the job (JobJournal.tag), becomes part of the filename.
+	:param fragment_workers: Number of fragments downloaded at the same time (for HLS/DASH formats).
+	:param events: JobEvents to report download progress to.
+	:param metrics: JobMetrics to record download time and size to.
+	:param limiter: BandwidthLimiter shared by all downloads, None for no limit.
+	:return: Path of downloaded file, None if download failed.
+	"""
+
 	ydl_opts = {
-		'format': best_video,
+		'format': format_id,
 		'paths': {
 			'home': save_folder,
 		},
-		'outtmpl': '%(id)s.%(ext)s',
-		'overwrites': True,
+		'outtmpl': f'%(id)s_media_scraper_{owner}_{role}_.%(ext)s',
+		'overwrites': False,  # already downloaded file (or its part) from interrupted job is reused
+		'continuedl': True,
 		'ignoreerrors': True,
+		'concurrent_fragment_downloads': fragment_workers,
+		'quiet': True,
+		'noprogress': True,
+		'logger': QuietLogger(),
+		'progress_hooks': [events.progress_hook],
+		**ydl_retry_options(),
 	}
-	if playlist_index is not None:
-		ydl_opts['playlist_items'] = str(playlist_index)
-	with YoutubeDL(ydl_opts) as ydl:
-		ydl.download([website])
-	sys.stdout = old_stdout
-	video_info = new_stdout.getvalue()
-	video_file = None
-	for line in video_info.split("\n"):
-		if "Destination: " in line:
-			video_file = line.split("Destination: ")[1].rstrip("\n")
-	if video_file is None:
-		return False
+	if limiter is not None and limiter.rate(CATEGORY_VIDEO) is not None:
+		# ratelimit keeps single download smooth, the hook makes all downloads share the budget
+		ydl_opts['ratelimit'] = limiter.rate(CATEGORY_VIDEO)
+		ydl_opts['progress_hooks'].append(limiter.progress_hook(CATEGORY_VIDEO))
+	from yt_dlp import YoutubeDL  # imported only when needed (it is slow to import)
+
+	# formats chosen by extract_info would override the requested format
+	info = {key: value for key, value in info.items() if key not in ("requested_formats", "requested_downloads")}
+	with YoutubeDL(ydl_opts) as ydl, metrics.time(STAGE_TRANSFER):
+		# process_ie_result modifies the info dict, sanitize_info gives us a fresh copy
+		result = ydl.process_ie_result(ydl.sanitize_info(info), download=True)
 
-	os.rename(video_file, f"{os.path.splitext(video_file)[0]}_media_scraper_video_{os.path.splitext(video_file)[1]}")
-	video_file = f"{os.path.splitext(video_file)[0]}_media_scraper_video_{os.path.splitext(video_file)[1]}"
-
-	if best_video != best_audio:
-		# download audio
-		# redirect stdout to capture the output file name
-		old_stdout = sys.stdout
-		new_stdout = io.StringIO()
-		sys.stdout = new_stdout
-		ydl_opts = {
-			'format': best_audio,
-			'paths': {
-				'home': save_folder,
-			},
-			'outtmpl': '%(id)s.%(ext)s',
-			'overwrites': True,
-			'ignoreerrors': True,
-		}
-		if playlist_index is not None:
-			ydl_opts['playlist_items'] = str(playlist_index)
-		with YoutubeDL(ydl_opts) as ydl:
-			ydl.download([website])
-		sys.stdout = old_stdout
-		audio_info = new_stdout.getvalue()
-		audio_file = None
-		for line in audio_info.split("\n"):
-			if "Destination: " in line:
-				audio_file = line.split("Destination: ")[1].rstrip("\n")
-		if audio_file is None:
-			return False
-		os.rename(audio_file, f"{os.path.splitext(audio_file)[0]}_media_scraper_audio_{os.path.splitext(audio_file)[1]}")
-		audio_file = f"{os.path.splitext(audio_file)[0]}_media_scraper_audio_{os.path.splitext(audio_file)[1]}"
-	else:
-		audio_file = video_file
-
-	# here we have the video and audio files downloaded
-
-	if best_audio == best_video:
-		# rename file to avoid ffmpeg overwriting
-
-		# remux with ffmpeg
-		subprocess.run([ffmpeg_path, '-y', '-i', video_file, '-c', 'copy', os.path.join(save_folder, video_title + '.mp4')],
-		               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=subprocess.CREATE_NO_WINDOW)
-
-		os.remove(video_file)
-	else:
-		# rename files to avoid ffmpeg overwriting
-
-		# merge with ffmpeg
-		subprocess.run([ffmpeg_path, '-y', '-an', '-i', video_file, '-vn', '-i', audio_file, '-c', 'copy', os.path.join(save_folder, video_title + '.mp4')],
-		               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=subprocess.CREATE_NO_WINDOW)
-
-		os.remove(video_file)
-		os.remove(audio_file)
-
-	return True
+	try:
+		path = result["requested_downloads"][0]["filepath"]
+	except (KeyError, IndexError, TypeError):
+		return None
+	if os.path.isfile(path):
+		metrics.add_bytes(role, os.path.getsize(path))
+	return path
 
 
 if __name__ == "__main__":
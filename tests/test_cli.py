@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from benchmarks.server import StandInServer
+from scripts.cli import main
+
+
+@pytest.fixture
+def server():
+	server = StandInServer(images=3, image_size=1024).start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def test_page_with_images_only_succeeds(server, tmp_path, capsys):
+	assert main(["-o", str(tmp_path), f"{server.url}/images.html"]) == 0
+	result = json.loads(capsys.readouterr().out)
+	assert result["images"] is not None and result["videos"] is None
+
+def test_missing_page_fails(server, tmp_path, capsys):
+	assert main(["-o", str(tmp_path), f"{server.url}/missing.html"]) == 1
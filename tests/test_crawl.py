@@ -0,0 +1,69 @@
+import http.server
+import threading
+
+import pytest
+
+from scripts import crawl
+from scripts.crawl import crawl_images
+from scripts.image import IMG_SAVED
+
+
+PNG = bytes.fromhex("89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489")
+PAGES = {
+	"/": '<a href="/gallery.html">gallery</a> <a href="/movie">movie</a> <a href="/archive.zip">zip</a> <a href="/huge.html">huge</a>'
+	     '<a href="https://other.example.com/page.html">other</a>',
+	"/gallery.html": '<img src="/a.png"><img src="/b.png">',
+	"/huge.html": '<img src="/huge.png">' + " " * 4096,
+}
+BINARY_SIZE = 1024 * 1024
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+	def log_message(self, format, *args):
+		pass
+
+	def do_GET(self):
+		self.server.requested.append(self.path)
+		if self.path in PAGES:
+			body, content_type = PAGES[self.path].encode("utf-8"), "text/html; charset=utf-8"
+		elif self.path.endswith(".png"):
+			body, content_type = PNG + self.path.encode("utf-8"), "image/png"
+		else:
+			body, content_type = b"\0" * BINARY_SIZE, "video/mp4" if self.path == "/movie" else "application/zip"
+		self.send_response(200)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		try:
+			self.wfile.write(body)
+			self.server.sent += len(body)
+		except ConnectionError:
+			pass
+
+
+@pytest.fixture
+def server():
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+	server.daemon_threads = True
+	server.requested = []
+	server.sent = 0
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def test_crawl_downloads_only_html_pages(server, tmp_path, monkeypatch):
+	monkeypatch.setattr(crawl, "MAX_PAGE_SIZE", 1024)
+	url = f"http://127.0.0.1:{server.server_address[1]}"
+	results = crawl_images(url + "/", str(tmp_path), max_depth=1)
+
+	assert results == {IMG_SAVED: 2}
+	assert "/archive.zip" not in server.requested  # skipped by extension
+	assert "/huge.png" not in server.requested  # page over the size limit isn't parsed
+	assert server.sent < BINARY_SIZE  # body of the video isn't downloaded
+
+def test_allowed_domains(server, tmp_path):
+	url = f"http://127.0.0.1:{server.server_address[1]}"
+	assert crawl_images(url + "/", str(tmp_path), max_depth=1, allowed_domains=["example.com"]) == {}
+	assert server.requested == ["/"]
@@ -0,0 +1,11 @@
+from scripts.extract import extract_images, extract_links, SCAN_PARSER
+
+
+PAGE = '<img src="a.png"><a href="b.jpg">image</a><a href="next.html#top">next</a><a href="mailto:someone@example.com">mail</a>'
+
+
+def test_links_are_collected_only_when_crawling():
+	assert extract_links(PAGE, "https://example.com/gallery/", SCAN_PARSER) == (
+		["https://example.com/gallery/a.png", "https://example.com/gallery/b.jpg"], ["https://example.com/gallery/next.html"])
+	assert extract_links(PAGE, "https://example.com/gallery/", SCAN_PARSER, collect_pages=False)[1] == []
+	assert extract_images(PAGE, "https://example.com/gallery/", SCAN_PARSER) == ["https://example.com/gallery/a.png", "https://example.com/gallery/b.jpg"]
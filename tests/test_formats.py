@@ -0,0 +1,133 @@
+from scripts.formats import _quality_bucket, FormatPolicy, select_formats
+
+
+MB = 1024 * 1024
+
+# format table of a YouTube video as returned by yt-dlp (sorted worst to best), urls and unused keys are left out
+YOUTUBE_FORMATS = [
+	{"format_id": "sb2", "ext": "mhtml", "protocol": "mhtml", "vcodec": "none", "acodec": "none", "width": 48, "height": 27},
+	{"format_id": "sb0", "ext": "mhtml", "protocol": "mhtml", "vcodec": "none", "acodec": "none", "width": 320, "height": 180},
+	{"format_id": "233", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "none", "acodec": "unknown"},
+	{"format_id": "139", "ext": "m4a", "protocol": "https", "vcodec": "none", "acodec": "mp4a.40.5", "abr": 48.8, "filesize": 1_232_034},
+	{"format_id": "249", "ext": "webm", "protocol": "https", "vcodec": "none", "acodec": "opus", "abr": 50.5, "filesize": 1_107_543},
+	{"format_id": "250", "ext": "webm", "protocol": "https", "vcodec": "none", "acodec": "opus", "abr": 66.2, "filesize": 1_451_877},
+	{"format_id": "140", "ext": "m4a", "protocol": "https", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 129.5, "filesize": 3_270_041},
+	{"format_id": "251", "ext": "webm", "protocol": "https", "vcodec": "none", "acodec": "opus", "abr": 131.9, "filesize": 3_301_287},
+	{"format_id": "160", "ext": "mp4", "protocol": "https", "vcodec": "avc1.4d400c", "acodec": "none", "width": 256, "height": 144, "tbr": 58.4, "filesize": 1_474_560},
+	{"format_id": "278", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 256, "height": 144, "tbr": 64.1, "filesize": 1_619_012},
+	{"format_id": "133", "ext": "mp4", "protocol": "https", "vcodec": "avc1.4d4015", "acodec": "none", "width": 426, "height": 240, "tbr": 122.9, "filesize": 3_102_744},
+	{"format_id": "242", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 426, "height": 240, "tbr": 113.4, "filesize": 2_863_219},
+	{"format_id": "134", "ext": "mp4", "protocol": "https", "vcodec": "avc1.4d401e", "acodec": "none", "width": 640, "height": 360, "tbr": 245.6, "filesize": 6_201_345},
+	{"format_id": "18", "ext": "mp4", "protocol": "https", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "width": 640, "height": 360, "tbr": 374.8,
+	 "filesize_approx": 9_459_820},
+	{"format_id": "243", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 640, "height": 360, "tbr": 209.7, "filesize": 5_294_112},
+	{"format_id": "135", "ext": "mp4", "protocol": "https", "vcodec": "avc1.4d401f", "acodec": "none", "width": 854, "height": 480, "tbr": 455.1, "filesize": 11_491_226},
+	{"format_id": "244", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 854, "height": 480, "tbr": 388.2, "filesize": 9_802_331},
+	{"format_id": "136", "ext": "mp4", "protocol": "https", "vcodec": "avc1.4d401f", "acodec": "none", "width": 1280, "height": 720, "tbr": 895.0, "filesize": 22_598_001},
+	{"format_id": "247", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 1280, "height": 720, "tbr": 772.3, "filesize": 19_500_877},
+	{"format_id": "137", "ext": "mp4", "protocol": "https", "vcodec": "avc1.640028", "acodec": "none", "width": 1920, "height": 1080, "tbr": 1655.2, "filesize": 41_795_342},
+	{"format_id": "248", "ext": "webm", "protocol": "https", "vcodec": "vp9", "acodec": "none", "width": 1920, "height": 1080, "tbr": 1393.7, "filesize": 35_190_115},
+]
+
+# format table of an HLS only site (no sizes, only bitrates), the last format is the best one
+HLS_FORMATS = [
+	{"format_id": "hls-audio-64", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "none", "acodec": "mp4a.40.5", "abr": 64},
+	{"format_id": "hls-audio-128", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128},
+	{"format_id": "hls-540", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "avc1.4d401f", "acodec": "none", "width": 960, "height": 540, "tbr": 1500},
+	{"format_id": "hls-1080", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "avc1.640028", "acodec": "none", "width": 1920, "height": 1080, "tbr": 4500},
+	{"format_id": "hls-1080-low", "ext": "mp4", "protocol": "m3u8_native", "vcodec": "avc1.640028", "acodec": "none", "width": 1920, "height": 1080, "tbr": 3000},
+]
+
+
+def video_format(format_id, width, size, **fields) -> dict:
+	return {"format_id": format_id, "ext": "mp4", "vcodec": "avc1", "acodec": "none", "width": width, "height": width * 9 // 16, "filesize": size, **fields}
+
+def audio_format(format_id, **fields) -> dict:
+	return {"format_id": format_id, "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", **fields}
+
+
+def test_default_policy_chooses_widest_and_biggest():
+	assert select_formats(YOUTUBE_FORMATS) == ("137", "251")
+
+def test_similar_sizes_are_decided_by_yt_dlp_order():
+	# the old selection kept formats within 5% of the biggest and took the last one, sizes now share log buckets instead
+	assert _quality_bucket(20 * MB) == _quality_bucket(20.2 * MB)
+	assert select_formats([video_format("a", 1920, 20.2 * MB), video_format("b", 1920, 20 * MB)]) == ("b", "b")
+	assert select_formats([video_format("a", 1920, 20 * MB), video_format("b", 1920, 20.2 * MB)]) == ("b", "b")
+	# unlike the cut-off, close sizes can fall on both sides of a bucket boundary, then the bigger one wins
+	assert _quality_bucket(20 * MB) != _quality_bucket(20.4 * MB)
+	assert select_formats([video_format("a", 1920, 20.4 * MB), video_format("b", 1920, 20 * MB)]) == ("a", "a")
+	# sizes differing by more than ~5% never share a bucket, the bigger one wins regardless of order
+	assert select_formats([video_format("a", 1920, 22 * MB), video_format("b", 1920, 20 * MB)]) == ("a", "a")
+
+def test_unknown_sizes_are_ranked_last():
+	formats = [video_format("sized", 1920, 5 * MB), video_format("unknown", 1920, None), video_format("smaller", 1280, 50 * MB)]
+	assert select_formats(formats)[0] == "sized"
+	# width is still more important than size
+	assert select_formats([video_format("unknown", 1920, None), video_format("sized", 1280, 50 * MB)])[0] == "unknown"
+
+def test_unknown_sizes_are_ranked_by_bitrate():
+	assert select_formats(HLS_FORMATS) == ("hls-1080", "hls-audio-128")
+	# without bitrate too, yt-dlp's order decides
+	formats = [{key: value for key, value in format.items() if key not in ("tbr", "abr")} for format in HLS_FORMATS]
+	assert select_formats(formats) == ("hls-1080-low", "hls-audio-128")
+
+def test_audio_sizes_and_bitrates_are_not_compared():
+	# bitrate (kbps) of format without size mustn't be compared to size (bytes) of other formats
+	formats = [video_format("v", 1280, 10 * MB), audio_format("bitrate", abr=160), audio_format("size", filesize=100, abr=48)]
+	assert select_formats(formats) == ("v", "size")
+	formats = [video_format("v", 1280, 10 * MB), audio_format("high", abr=160), audio_format("low", abr=48)]
+	assert select_formats(formats) == ("v", "high")
+	formats = [video_format("v", 1280, 10 * MB), audio_format("high", filesize=3 * MB, abr=48), audio_format("low", filesize=1 * MB, abr=160)]
+	assert select_formats(formats) == ("v", "high")
+
+def test_storyboards_are_excluded():
+	storyboards = [format for format in YOUTUBE_FORMATS if format["format_id"].startswith("sb")]
+	muxed = next(format for format in YOUTUBE_FORMATS if format["format_id"] == "18")
+	# storyboards have dimensions, but neither video nor audio
+	assert select_formats(storyboards) == (None, None)
+	assert select_formats([*storyboards, muxed]) == ("18", "18")
+
+def test_no_video_format():
+	audio_only = [format for format in YOUTUBE_FORMATS if format["vcodec"] == "none"]
+	assert select_formats(audio_only) == (None, None)
+	assert select_formats([]) == (None, None)
+
+def test_resolution_cap():
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(max_height=720))[0] == "136"
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(max_width=854, max_height=720))[0] == "135"
+	assert select_formats(HLS_FORMATS, FormatPolicy(max_height=720))[0] == "hls-540"
+
+def test_resolution_cap_is_ignored_if_nothing_fits():
+	# the smallest format is used when no format fits
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(max_height=100))[0] == "160"
+	assert select_formats(HLS_FORMATS, FormatPolicy(max_width=640))[0] == "hls-540"
+
+def test_preferred_codecs_and_containers():
+	policy = FormatPolicy(max_height=720, video_codecs=("vp9",), audio_codecs=("mp4a",))
+	assert select_formats(YOUTUBE_FORMATS, policy) == ("247", "140")
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(containers=("webm",))) == ("248", "251")
+	# container preference is stronger than size, even unknown one
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(containers=("mp4", "m4a"))) == ("137", "233")
+	# codec preference doesn't beat resolution
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(video_codecs=("vp9",)))[0] == "248"
+
+def test_size_budget():
+	policy = FormatPolicy(size_budget=20 * MB)
+	assert select_formats(YOUTUBE_FORMATS, policy) == ("247", "251")
+	# formats without size fit any budget
+	assert select_formats(HLS_FORMATS, policy) == ("hls-1080", "hls-audio-128")
+
+def test_size_budget_is_ignored_if_nothing_fits():
+	# no video fits, so the smallest one is used, HLS audio without size fits any budget
+	assert select_formats(YOUTUBE_FORMATS, FormatPolicy(size_budget=MB)) == ("160", "233")
+	# nothing fits, so the smallest video and audio are used
+	sized_formats = [format for format in YOUTUBE_FORMATS if format["format_id"] != "233"]
+	assert select_formats(sized_formats, FormatPolicy(size_budget=MB)) == ("160", "249")
+	# audio which fits is used even if no video fits
+	assert select_formats(sized_formats, FormatPolicy(size_budget=1_300_000)) == ("160", "139")
+
+def test_bitrate_per_pixel():
+	formats = [video_format("efficient", 1920, 30 * MB, tbr=3000, fps=30), video_format("wasteful", 1920, 40 * MB, tbr=2000, fps=60)]
+	assert select_formats(formats)[0] == "wasteful"
+	assert select_formats(formats, FormatPolicy(bitrate_per_pixel=True))[0] == "efficient"
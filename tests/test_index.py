@@ -0,0 +1,63 @@
+import hashlib
+import os
+
+import pytest
+
+from scripts import index as index_module
+from scripts.index import FolderIndex
+
+
+def test_only_images_are_hashed(tmp_path, monkeypatch):
+	(tmp_path / "photo.jpg").write_bytes(b"jpeg")
+	(tmp_path / "Photo2.PNG").write_bytes(b"png")
+	(tmp_path / "video.mp4").write_bytes(b"video")
+	(tmp_path / "abc_media_scraper_video_.mp4.part").write_bytes(b"part")
+	(tmp_path / ".media_scraper_0123").write_bytes(b"temp")
+
+	hashed = []
+	file_hash = index_module.file_hash
+	monkeypatch.setattr(index_module, "file_hash", lambda path: hashed.append(path) or file_hash(path))
+
+	index = FolderIndex(str(tmp_path))
+	try:
+		assert sorted(os.path.basename(path) for path in hashed) == ["Photo2.PNG", "photo.jpg"]
+		assert index.find(hashlib.sha256(b"jpeg").hexdigest()) == "photo.jpg"
+		assert index.find(hashlib.sha256(b"video").hexdigest()) is None
+
+		# growing video isn't rehashed, its name still isn't given to a downloaded image
+		(tmp_path / "abc_media_scraper_video_.mp4.part").write_bytes(b"part, longer")
+		hashed.clear()
+		index.update()
+		assert hashed == []
+		temp_path = tmp_path / ".media_scraper_new"
+		temp_path.write_bytes(b"image")
+		assert index.store(str(temp_path), "video.mp4", hashlib.sha256(b"image").hexdigest()) == "video (2).mp4"
+	finally:
+		index.close()
+
+def test_duplicate_with_missing_temp_file(tmp_path):
+	(tmp_path / "photo.jpg").write_bytes(b"jpeg")
+	index = FolderIndex(str(tmp_path))
+	try:
+		# another job already removed the temporary file
+		assert index.store(str(tmp_path / ".media_scraper_gone"), "photo.jpg", hashlib.sha256(b"jpeg").hexdigest()) is None
+	finally:
+		index.close()
+
+def test_failed_removal_of_duplicate_keeps_index_usable(tmp_path, monkeypatch):
+	(tmp_path / "photo.jpg").write_bytes(b"jpeg")
+	temp_path = tmp_path / ".media_scraper_duplicate"
+	temp_path.write_bytes(b"jpeg")
+	index = FolderIndex(str(tmp_path))
+	try:
+		def remove(path):
+			raise PermissionError(path)
+
+		monkeypatch.setattr(os, "remove", remove)
+		# the OSError is left to the caller, it mustn't turn into sqlite error about rollback without transaction
+		with pytest.raises(PermissionError):
+			index.store(str(temp_path), "photo.jpg", hashlib.sha256(b"jpeg").hexdigest())
+		monkeypatch.undo()
+		assert index.find(hashlib.sha256(b"jpeg").hexdigest()) == "photo.jpg"
+	finally:
+		index.close()
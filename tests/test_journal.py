@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+from scripts.journal import JobBusyError, JobJournal, resume_path, STATE_PARTIAL
+
+
+def test_same_job_cant_run_twice(tmp_path):
+	journal = JobJournal(str(tmp_path), "images https://example.com/")
+	with pytest.raises(JobBusyError):
+		JobJournal(str(tmp_path), "images https://example.com/")
+	# other jobs aren't affected
+	JobJournal(str(tmp_path), "images https://example.com/other").finish()
+
+	journal.record("https://example.com/a.png", STATE_PARTIAL)
+	journal.close()
+	resumed = JobJournal(str(tmp_path), "images https://example.com/")
+	assert resumed.state("https://example.com/a.png") == STATE_PARTIAL
+	resumed.finish()
+	JobJournal(str(tmp_path), "images https://example.com/").finish()
+
+def test_same_job_cant_run_in_another_process(tmp_path):
+	journal = JobJournal(str(tmp_path), "images https://example.com/")
+	try:
+		code = ("import sys\nfrom scripts.journal import JobBusyError, JobJournal\n"
+		        "try:\n\tJobJournal(sys.argv[1], 'images https://example.com/')\nexcept JobBusyError:\n\tsys.exit(3)\n")
+		assert subprocess.run([sys.executable, "-c", code, str(tmp_path)]).returncode == 3
+	finally:
+		journal.finish()
+	code = "import sys\nfrom scripts.journal import JobJournal\nJobJournal(sys.argv[1], 'images https://example.com/').finish()\n"
+	assert subprocess.run([sys.executable, "-c", code, str(tmp_path)]).returncode == 0
+
+def test_jobs_dont_share_temporary_files(tmp_path):
+	first = JobJournal(str(tmp_path), "images https://example.com/first")
+	second = JobJournal(str(tmp_path), "images https://example.com/second")
+	try:
+		url = "https://cdn.example.com/image.png"
+		assert resume_path(str(tmp_path), url, ".part_", first.tag) != resume_path(str(tmp_path), url, ".part_", second.tag)
+		assert resume_path(str(tmp_path), url, ".part_", first.tag) == resume_path(str(tmp_path), url, ".part_", first.tag)
+	finally:
+		first.finish()
+		second.finish()
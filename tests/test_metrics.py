@@ -0,0 +1,34 @@
+import shutil
+
+import pytest
+
+from benchmarks.server import StandInServer
+from scripts.image import download_images
+from scripts.metrics import JobMetrics
+from scripts.video import download_videos
+
+
+@pytest.fixture
+def server():
+	server = StandInServer(images=3, image_size=1024, videos=1, video_size=16 * 1024).start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def test_done_event_of_image_job_is_counted(server, tmp_path):
+	metrics = JobMetrics()
+	assert download_images(f"{server.url}/images.html", str(tmp_path), metrics=metrics) is not None
+	assert metrics.counters["file"] == 3
+	assert metrics.counters["done"] == 1
+
+def test_done_event_of_video_job_is_counted(server, tmp_path):
+	metrics = JobMetrics()
+	# without ffmpeg the video can't be muxed, the job still finishes
+	assert download_videos(f"{server.url}/videos.html", str(tmp_path), str(tmp_path / "missing-ffmpeg"), metrics=metrics) is not None
+	assert metrics.counters["done"] == 1
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not found")
+def test_stand_in_videos_are_muxed(server, tmp_path):
+	results = download_videos(f"{server.url}/videos.html", str(tmp_path), shutil.which("ffmpeg"))
+	assert list(results.values()) == [True]
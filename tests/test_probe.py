@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.server import StandInServer
+from scripts.image import download_images
+from scripts.probe import ImageFilter, PROBE_BYTES
+
+
+@pytest.mark.parametrize("image_size, requests", [(1024, 1), (PROBE_BYTES, 1), (4 * PROBE_BYTES, 2)])
+def test_small_images_are_not_downloaded_twice(tmp_path, image_size, requests):
+	server = StandInServer(images=3, image_size=image_size).start()
+	try:
+		download_images(f"{server.url}/images.html", str(tmp_path), image_filter=ImageFilter())
+		assert server.stats()["requests"]["images"] == 1 + 3 * requests
+
+		saved = [path for path in tmp_path.iterdir() if path.suffix == ".png"]
+		assert len(saved) == 3
+		assert all(path.stat().st_size == image_size for path in saved)
+	finally:
+		server.shutdown()
+		server.server_close()
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+import requests
+
+from scripts.scheduler import HostScheduler
+
+
+class FailingSession:
+	"""
+	Session whose requests always raise given exception.
+	"""
+
+	def __init__(self, exception):
+		self.exception = exception
+		self.calls = 0
+
+	def request(self, method, url, **kwargs):
+		self.calls += 1
+		raise self.exception
+
+
+@pytest.mark.parametrize("exception", [requests.TooManyRedirects(), requests.exceptions.InvalidURL(), requests.exceptions.InvalidSchema(),
+                                       requests.exceptions.InvalidHeader(), ValueError()])
+def test_non_retryable_error_releases_slot(exception):
+	scheduler = HostScheduler(concurrency=1, max_retries=3)
+	session = FailingSession(exception)
+
+	with pytest.raises(type(exception)):
+		with scheduler.request(session, "GET", "http://example.com/loop.png"):
+			pass
+	assert session.calls == 1  # not retried
+	assert scheduler.hosts["example.com"].in_flight == 0
+
+	# with a single slot per host, a leaked slot would block this request forever
+	with pytest.raises(type(exception)):
+		with scheduler.request(session, "GET", "http://example.com/loop.png"):
+			pass
+	assert scheduler.hosts["example.com"].in_flight == 0
+
+def test_retried_connection_error_releases_slot(monkeypatch):
+	monkeypatch.setattr("scripts.scheduler.backoff_delay", lambda attempt: 0)
+	scheduler = HostScheduler(concurrency=1, max_retries=2)
+	session = FailingSession(requests.ConnectionError())
+
+	with pytest.raises(requests.ConnectionError):
+		with scheduler.request(session, "GET", "http://example.com/image.png"):
+			pass
+
+	assert session.calls == 3
+	assert scheduler.hosts["example.com"].in_flight == 0
+
+def test_slot_is_released_for_other_threads():
+	scheduler = HostScheduler(concurrency=1, max_retries=0)
+	session = FailingSession(requests.TooManyRedirects())
+
+	def request():
+		try:
+			with scheduler.request(session, "GET", "http://example.com/loop.png"):
+				pass
+		except requests.TooManyRedirects:
+			pass
+
+	threads = [threading.Thread(target=request, daemon=True) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join(timeout=5)
+	assert not any(thread.is_alive() for thread in threads)
+	assert session.calls == 4
@@ -0,0 +1,37 @@
+import subprocess
+
+from scripts.archive import archive_id, VideoArchive
+from scripts.events import JobEvents
+from scripts.metrics import JobMetrics
+from scripts.video import _mux, _stream_formats, entry_key
+
+
+PLAIN_FORMAT = {"format_id": "18", "protocol": "https", "url": "https://example.com/video.mp4", "ext": "mp4"}
+
+
+def test_formats_downloaded_by_yt_dlp_are_not_streamed(tmp_path, monkeypatch):
+	def run_ffmpeg(args):
+		raise AssertionError("format was streamed")
+
+	monkeypatch.setattr("scripts.video.run_ffmpeg", run_ffmpeg)
+	output_file = str(tmp_path / "video.mp4")
+	for fmt in ({**PLAIN_FORMAT, "downloader_options": {"http_chunk_size": 10485760}},
+	            {**PLAIN_FORMAT, "cookies": "SID=secret; Domain=.example.com"},
+	            {**PLAIN_FORMAT, "protocol": "http_dash_segments", "fragments": [{"url": "https://example.com/1"}]}):
+		assert not _stream_formats("ffmpeg", fmt, None, output_file, JobMetrics())
+		assert not _stream_formats("ffmpeg", PLAIN_FORMAT, fmt, output_file, JobMetrics())
+
+def test_muxed_video_is_archived_by_id(tmp_path, monkeypatch):
+	monkeypatch.setattr("scripts.video.run_ffmpeg", lambda args: subprocess.CompletedProcess(args, 0))
+	video_file, output_file = tmp_path / "video.part.mp4", tmp_path / "video.mp4"
+	video_file.write_bytes(b"video")
+	output_file.write_bytes(b"muxed")
+	info = {"id": "abc", "extractor_key": "Generic", "webpage_url": "https://example.com/abc"}
+	archive = VideoArchive(str(tmp_path))
+	try:
+		assert _mux("ffmpeg", (entry_key(info), info["webpage_url"], archive_id(info)), str(video_file), None, str(output_file),
+		            JobEvents(), None, JobMetrics(), archive)
+		assert archive.downloaded(info)
+		assert not video_file.exists()
+	finally:
+		archive.close()